@@ -0,0 +1,112 @@
+"""Группировка сообщений об ошибках и периодические сводки."""
+import os
+import time
+
+ERROR_SUPPRESSION_WINDOW = float(os.getenv('ERROR_SUPPRESSION_WINDOW', 3600))
+
+
+def root_error(error):
+    """Исходная ошибка под обёртками `Exception` с текстом."""
+    while type(error) is Exception:
+        cause = error.__cause__ or error.__context__
+        if cause is None:
+            break
+        error = cause
+    return error
+
+
+def fingerprint(error, stage):
+    """Отпечаток ошибки: этап и класс исходной ошибки без её текста."""
+    return stage, type(root_error(error)).__name__
+
+
+def format_window(seconds):
+    """Длительность окна для текста сводки."""
+    if seconds % 3600 == 0:
+        hours = int(seconds // 3600)
+        return 'последний час' if hours == 1 else f'последние {hours} ч'
+    if seconds % 60 == 0:
+        return f'последние {int(seconds // 60)} мин'
+    return f'последние {seconds:g} с'
+
+
+class ErrorGroup:
+    """Повторы ошибки с одним отпечатком в текущем окне."""
+
+    __slots__ = ('opened_at', 'count', 'last_error')
+
+    def __init__(self, opened_at, last_error):
+        """Группа, открытая в момент `opened_at` ошибкой `last_error`."""
+        self.opened_at = opened_at
+        self.count = 0
+        self.last_error = last_error
+
+
+class ErrorReporter:
+    """Решает, какие сообщения об ошибках отправлять пользователю.
+
+    Ошибки группируются по отпечатку (этап и класс исходной ошибки).
+    О первой ошибке группы пользователь узнаёт сразу, повторы в течение
+    `window` секунд только считаются. По истечении окна вместо них
+    приходит одна сводка «ошибка X повторилась N раз за последний
+    час»; если повторов не было, группа забывается и следующая такая
+    ошибка снова придёт отдельным сообщением. Если сообщение о первой
+    ошибке отправить не удалось, вызывающий сбрасывает группу `reset`;
+    неотправленная сводка остаётся в группе до следующего `flush`.
+    """
+
+    def __init__(self, window=ERROR_SUPPRESSION_WINDOW, clock=time.monotonic):
+        """Окно группировки `window` секунд по часам `clock`."""
+        self.window = window
+        self.clock = clock
+        self.groups = {}
+
+    def report(self, error, stage):
+        """Учитывает ошибку; возвращает сообщение или None, если повтор."""
+        now = self.clock()
+        key = fingerprint(error, stage)
+        group = self.groups.get(key)
+        if group is None or (
+                not group.count and now - group.opened_at >= self.window):
+            self.groups[key] = ErrorGroup(now, str(error))
+            return f'Сбой в работе программы: {error}'
+        group.count += 1
+        group.last_error = str(error)
+        return None
+
+    def reset(self, error, stage):
+        """Забывает группу ошибки, сообщение о которой не отправлено.
+
+        Следующая такая ошибка снова придёт отдельным сообщением, а не
+        будет молча считаться повтором до конца окна.
+        """
+        self.groups.pop(fingerprint(error, stage), None)
+
+    def flush(self, send):
+        """Отправляет через `send` сводки по группам, окно которых истекло.
+
+        Группа начинает новое окно, только если `send` вернул истину;
+        иначе повторы продолжают копиться и сводка уйдёт позже.
+        Возвращает отправленные сводки.
+        """
+        now = self.clock()
+        messages = []
+        for key, group in list(self.groups.items()):
+            if now - group.opened_at < self.window:
+                continue
+            if not group.count:
+                del self.groups[key]
+                continue
+            message = self._digest(key, group)
+            if send(message):
+                messages.append(message)
+                self.groups[key] = ErrorGroup(now, group.last_error)
+        return messages
+
+    def _digest(self, key, group):
+        stage, name = key
+        return (
+            f'Сбой в работе программы: ошибка {name} на этапе {stage} '
+            f'повторилась {group.count} раз за {format_window(self.window)}. '
+            f'Последняя: {group.last_error}'
+        )
@@ -0,0 +1,197 @@
+"""Импорт истории домашних работ с потоковым разбором ответа API."""
+import codecs
+import json
+import logging
+import os
+from http import HTTPStatus
+
+import exceptions
+import homework
+from cursor import CursorStore
+from storage import HomeworkRecord, StatusStore
+
+BACKFILL_BATCH = int(os.getenv('BACKFILL_BATCH', 500))
+BACKFILL_CHUNK = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+
+
+class HomeworksStream:
+    """Потоковый разбор ответа API.
+
+    Читает тело ответа кусками из `chunks` и отдаёт элементы массива
+    `homeworks` по одному: в памяти держится только недоразобранный
+    хвост буфера и текущий элемент. Остальные ключи верхнего уровня,
+    например `current_date`, разбираются целиком и после окончания
+    итерации доступны в `fields`.
+    """
+
+    def __init__(self, chunks):
+        """Поток из итератора кусков ответа `chunks`."""
+        self._chunks = iter(chunks)
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._position = 0
+        self.fields = {}
+        self.has_homeworks = False
+
+    def __iter__(self):
+        """Домашние работы по мере чтения ответа."""
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise exceptions.WrongDataFormat(
+                    'Некорректный JSON в ответе API'
+                )
+            self._expect(':')
+            if key == 'homeworks' and self._peek() == '[':
+                self.has_homeworks = True
+                yield from self._array()
+            else:
+                self.fields[key] = self._value()
+            if self._expect(',}') == '}':
+                return
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    def _fill(self):
+        """Дочитывает кусок ответа; False, если ответ закончился."""
+        for chunk in self._chunks:
+            text = self._text.decode(chunk)
+            if text:
+                break
+        else:
+            text = self._text.decode(b'', final=True)
+            if not text:
+                return False
+        self._buffer = self._buffer[self._position:] + text
+        self._position = 0
+        return True
+
+    def _peek(self):
+        """Первый непробельный символ без его чтения."""
+        while True:
+            buffer = self._buffer
+            while (self._position < len(buffer)
+                   and buffer[self._position] in WHITESPACE):
+                self._position += 1
+            if self._position < len(buffer):
+                return buffer[self._position]
+            if not self._fill():
+                raise exceptions.WrongDataFormat('Ответ API оборвался')
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char not in chars:
+            raise exceptions.WrongDataFormat(
+                f'Некорректный JSON в ответе API: ожидался один из '
+                f'символов {chars!r}, получен {char!r}'
+            )
+        self._position += 1
+        return char
+
+    def _value(self):
+        """Разбирает одно значение, дочитывая ответ при необходимости."""
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError as error:
+                if self._fill():
+                    continue
+                raise exceptions.WrongDataFormat(
+                    f'Некорректный JSON в ответе API: {error}'
+                )
+            incomplete_number = (
+                end == len(self._buffer)
+                and isinstance(value, (int, float))
+                and not isinstance(value, bool)
+            )
+            if incomplete_number and self._fill():
+                continue
+            self._position = end
+            return value
+
+
+def backfill(headers, tenant, store, client=None, batch_size=BACKFILL_BATCH):
+    """Загружает всю историю статусов пользователя в хранилище.
+
+    Ответ на запрос с `from_date=0` читается потоком, каждая работа
+    превращается в `HomeworkRecord` и пишется в хранилище пачками
+    по `batch_size` записей, поэтому память не растёт с длиной истории.
+    Сообщения не отправляются: загруженные статусы считаются уже
+    известными. Возвращает число работ и `current_date` ответа.
+    """
+    response = (client or homework.API_CLIENT).get(
+        headers, {'from_date': 0}, stream=True
+    )
+    count = 0
+    try:
+        if response.status_code != HTTPStatus.OK:
+            raise Exception(
+                f'Ошбика при запросе к API: {response.status_code}'
+            )
+        stream = HomeworksStream(response.iter_content(BACKFILL_CHUNK))
+        batch = []
+        for item in stream:
+            if not isinstance(item, dict) or not item.get('status'):
+                raise exceptions.WrongDataFormat(
+                    f'Некорректная запись о домашней работе: {item!r}'
+                )
+            batch.append(HomeworkRecord.from_dict(item))
+            if len(batch) >= batch_size:
+                store.remember_records(tenant, batch)
+                count += len(batch)
+                batch = []
+        if not stream.has_homeworks:
+            raise exceptions.HomeworksKeyError(
+                'В ответе API нет ключа homeworks'
+            )
+        store.remember_records(tenant, batch)
+        count += len(batch)
+    finally:
+        response.close()
+    return count, stream.fields.get('current_date')
+
+
+def main(path=None):
+    """Загружает историю одного пользователя или всех из файла `path`.
+
+    Курсор каждого пользователя сдвигается на `current_date` ответа,
+    чтобы опрос продолжился с момента загрузки.
+    """
+    if path:
+        import tenants
+        users = [
+            (tenant.name, tenant.headers)
+            for tenant in tenants.load_tenants(path)
+        ]
+    elif homework.check_tokens():
+        users = [(homework.DEFAULT_TENANT, homework.HEADERS)]
+    else:
+        logger.critical('Необходимые переменные окружения отсутствуют')
+        raise exceptions.TokenError('Tokens Error')
+    cursors = CursorStore(homework.CURSOR_FILE, flush_interval=3600)
+    store = StatusStore(homework.STORE_FILE)
+    try:
+        for name, headers in users:
+            count, current_date = backfill(headers, name, store)
+            homework.TenantState(0, cursors, name).advance(current_date)
+            logger.info(f'Пользователь {name}: загружено работ {count}')
+    finally:
+        cursors.flush()
+        store.close()
@@ -0,0 +1,75 @@
+"""Бенчмарк импорта истории: потоковый разбор против `response.json()`.
+
+Для каждой длины истории печатает время и пиковую память, выделенную
+Python (tracemalloc), при загрузке через `backfill` и при разборе
+всего ответа целиком.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_backfill --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from backfill import backfill
+from benchmarks.stubs import HistoryStubHandler, StubProcess
+from client import PracticumClient
+from storage import HomeworkRecord, StatusStore
+
+HEADERS = {'Authorization': 'OAuth benchmark'}
+
+
+def measure(func):
+    """Время работы и пиковая память функции."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def whole_response(client, store):
+    """Прежний способ: весь ответ разбирается в список словарей."""
+    response = client.get(HEADERS, {'from_date': 0})
+    homeworks = response.json()['homeworks']
+    store.remember_records(
+        'default', [HomeworkRecord.from_dict(item) for item in homeworks]
+    )
+
+
+def main():
+    """Сравнивает потоковый импорт с разбором ответа целиком."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[1000, 10000, 100000]
+    )
+    args = parser.parse_args()
+    client = PracticumClient('', pool_size=1)
+    client.session
+    for size in args.sizes:
+        HistoryStubHandler.history_size = size
+        with StubProcess(HistoryStubHandler) as server, \
+                tempfile.TemporaryDirectory() as directory:
+            client.endpoint = server.url
+            store = StatusStore(os.path.join(directory, 'homework.db'))
+            for title, func in (
+                ('streaming', lambda: backfill(HEADERS, 'default', store,
+                                               client)),
+                ('json()', lambda: whole_response(client, store)),
+            ):
+                elapsed, peak = measure(func)
+                print(
+                    f'{size:>7} homeworks {title:>9}: {elapsed:.3f} s, '
+                    f'peak {peak / 1024 / 1024:.2f} MiB'
+                )
+            store.close()
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
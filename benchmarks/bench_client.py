@@ -0,0 +1,53 @@
+"""Бенчмарк клиента API Практикума с пулом соединений и без него.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_client --requests 2000 --concurrency 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import PracticumStubHandler, StubServer, percentile
+from client import PracticumClient
+
+HEADERS = {'Authorization': 'OAuth benchmark'}
+
+
+def run(client, requests_count, concurrency):
+    """Выполняет запросы и возвращает задержки в секундах и общее время."""
+    def timed_request(number):
+        started = time.perf_counter()
+        response = client.get(HEADERS, {'from_date': number})
+        response.json()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed_request, range(requests_count)))
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    """Сравнивает запросы с пулом соединений и без него."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+    with StubServer(PracticumStubHandler) as server:
+        for title, pool_size in (
+            ('without pool', 0), ('pooled', args.concurrency)
+        ):
+            client = PracticumClient(server.url, pool_size=pool_size)
+            latencies, elapsed = run(client, args.requests, args.concurrency)
+            client.close()
+            print(
+                f'{title:>12}: '
+                f'p50={percentile(latencies, 50) * 1000:.2f}ms '
+                f'p99={percentile(latencies, 99) * 1000:.2f}ms '
+                f'rps={args.requests / elapsed:.0f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
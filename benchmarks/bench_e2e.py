@@ -0,0 +1,157 @@
+"""Нагрузочный бенчмарк всего конвейера на локальных заглушках.
+
+Запускает заглушки API Практикума и Telegram Bot API в отдельных
+процессах и прогоняет `get_api_answer -> check_response ->
+parse_status -> send_message` для 1, 100 и 10 000 пользователей.
+Результаты сравниваются с `benchmarks/baseline.json`; при регрессии
+больше допустимой скрипт завершается с ненулевым кодом.
+
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --tenants 1 100 --update-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+
+import homework
+# homework и client импортируют requests лениво, при первом запросе;
+# импорт здесь не даёт ему попасть в замер первого опроса.
+import requests.adapters  # noqa: F401
+import telegram
+import tenants
+from benchmarks.stubs import (ChangingPracticumStubHandler, StubProcess,
+                              TelegramStubHandler, percentile)
+from sender import SendQueue
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+HIGHER_IS_BETTER = ('polls_per_sec', 'messages_per_sec')
+LOWER_IS_BETTER = ('poll_p99_ms', 'send_p99_ms', 'rss_mb')
+
+
+class TimedBot:
+    """Бот, замеряющий длительность каждой отправки."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.latencies = []
+
+    def send_message(self, chat_id, text):
+        started = time.perf_counter()
+        try:
+            return self.bot.send_message(chat_id, text)
+        finally:
+            self.latencies.append(time.perf_counter() - started)
+
+
+def run_case(tenants_count, iterations, workers, practicum_url, telegram_url):
+    """Прогоняет конвейер для `tenants_count` пользователей."""
+    homework.ENDPOINT = practicum_url
+    homework.RETRY_PERIOD = 0
+    poll_latencies = []
+    poll_once = homework.poll_once
+
+    def timed_poll_once(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return poll_once(*args, **kwargs)
+        finally:
+            poll_latencies.append(time.perf_counter() - started)
+
+    homework.poll_once = timed_poll_once
+    bot = TimedBot(telegram.Bot(
+        token='1234:benchmark', base_url=f'{telegram_url}bot'
+    ))
+    queue = SendQueue(bot, rate=10 ** 9, chat_rate=10 ** 9)
+    all_tenants = [
+        tenants.Tenant(f'token{number}', number + 1)
+        for number in range(tenants_count)
+    ]
+    started = time.perf_counter()
+    try:
+        asyncio.run(tenants.run_tenants(
+            all_tenants, bot, workers=workers, queue=queue,
+            iterations=iterations
+        ))
+    finally:
+        homework.poll_once = poll_once
+    elapsed = time.perf_counter() - started
+    polls = sorted(poll_latencies)
+    sends = sorted(bot.latencies)
+    return {
+        'polls_per_sec': len(polls) / elapsed,
+        'messages_per_sec': len(sends) / elapsed,
+        'poll_p99_ms': percentile(polls, 99) * 1000,
+        'send_p99_ms': percentile(sends, 99) * 1000,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Список регрессий относительно сохранённого базового прогона."""
+    regressions = []
+    for case, metrics in results.items():
+        for name, value in metrics.items():
+            expected = baseline.get(case, {}).get(name)
+            if expected is None:
+                continue
+            if name in HIGHER_IS_BETTER:
+                regressed = value < expected * (1 - tolerance)
+            else:
+                regressed = value > expected * (1 + tolerance)
+            if regressed:
+                regressions.append(
+                    f'{case} tenants: {name} {value:.1f} '
+                    f'(baseline {expected:.1f})'
+                )
+    return regressions
+
+
+def main():
+    """Запуск бенчмарка и сравнение с базовым прогоном."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--tenants', type=int, nargs='+', default=[1, 100, 10000]
+    )
+    parser.add_argument('--iterations', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=tenants.TENANT_WORKERS)
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+    results = {}
+    with StubProcess(ChangingPracticumStubHandler) as practicum, \
+            StubProcess(TelegramStubHandler) as telegram_api:
+        for count in args.tenants:
+            metrics = run_case(
+                count, args.iterations, args.workers,
+                practicum.url, telegram_api.url
+            )
+            results[str(count)] = metrics
+            print(f'{count:>6} tenants: ' + ' '.join(
+                f'{name}={value:.1f}' for name, value in metrics.items()
+            ))
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(BASELINE_FILE):
+            with open(BASELINE_FILE, encoding='utf-8') as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as file:
+            json.dump(baseline, file, indent=4, sort_keys=True)
+            file.write('\n')
+        return
+    if not os.path.exists(BASELINE_FILE):
+        return
+    with open(BASELINE_FILE, encoding='utf-8') as file:
+        regressions = compare(results, json.load(file), args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION: {regression}')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Бенчмарк холодного старта: время импорта модуля homework.
+
+Каждый замер — отдельный процесс `python -X importtime -c "import homework"`,
+из вывода берётся суммарное время импорта homework. Бенчмарк завершается
+с ненулевым кодом, если медиана превышает бюджет.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_startup --runs 15 --budget-ms 80
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module):
+    """Время импорта модуля в микросекундах и время работы процесса."""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - started
+    for line in result.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]), wall
+    raise RuntimeError(f'Модуль {module} не найден в выводе importtime')
+
+
+def main():
+    """Замеряет импорт и сравнивает медиану с бюджетом."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='homework')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=80)
+    args = parser.parse_args()
+    imports, walls = zip(*(import_time(args.module) for _ in range(args.runs)))
+    median = statistics.median(imports) / 1000
+    print(
+        f'import {args.module}: median {median:.1f} ms, '
+        f'min {min(imports) / 1000:.1f} ms, max {max(imports) / 1000:.1f} ms; '
+        f'process wall median {statistics.median(walls) * 1000:.1f} ms; '
+        f'budget {args.budget_ms:.0f} ms'
+    )
+    if median > args.budget_ms:
+        print('Время импорта превышает бюджет')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
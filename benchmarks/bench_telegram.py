@@ -0,0 +1,64 @@
+"""Бенчмарк отправки в Telegram: потоки отправки и пул соединений.
+
+Отправляет сообщения в заглушку Bot API (`TelegramStubHandler`) через
+`SendQueue` с разным числом потоков и печатает сообщения в секунду
+и p99 длительности отправки. Заглушка отвечает с задержкой
+`--latency`, как настоящий Bot API.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_telegram --workers 1 4 16 --latency 0.05
+"""
+import argparse
+import time
+
+import telegram
+from benchmarks.bench_e2e import TimedBot
+from benchmarks.stubs import StubProcess, TelegramStubHandler, percentile
+from sender import SendQueue, create_bot
+
+
+def run_case(url, workers, pool_size, messages, chats):
+    """Сообщений в секунду и p99 отправки в миллисекундах."""
+    if pool_size:
+        bot = create_bot(
+            '1234:benchmark', pool_size=pool_size, base_url=f'{url}bot'
+        )
+    else:
+        bot = telegram.Bot(token='1234:benchmark', base_url=f'{url}bot')
+    bot = TimedBot(bot)
+    queue = SendQueue(bot, rate=10 ** 9, chat_rate=10 ** 9, workers=workers)
+    started = time.perf_counter()
+    for number in range(messages):
+        queue.put(number % chats + 1, f'Сообщение {number}')
+    queue.close()
+    elapsed = time.perf_counter() - started
+    latencies = sorted(bot.latencies)
+    return len(latencies) / elapsed, percentile(latencies, 99) * 1000
+
+
+def main():
+    """Сравнивает отправку с разным числом потоков."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--chats', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    TelegramStubHandler.latency = args.latency
+    with StubProcess(TelegramStubHandler) as server:
+        for workers in args.workers:
+            for title, pool_size in (
+                ('default request', 0), ('pooled', workers + 4)
+            ):
+                per_second, p99 = run_case(
+                    server.url, workers, pool_size, args.messages, args.chats
+                )
+                print(
+                    f'{workers:>3} workers, {title:>15}: '
+                    f'{per_second:8.1f} msg/s, p99 {p99:6.1f} ms'
+                )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Локальные заглушки внешних API для бенчмарков."""
+import itertools
+import json
+import multiprocessing
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATUSES = ('reviewing', 'rejected', 'approved')
+
+
+class PracticumStubHandler(BaseHTTPRequestHandler):
+    """Отвечает как эндпоинт `homework_statuses` с keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+    homeworks = [{
+        'id': 1,
+        'homework_name': 'stub__hw.zip',
+        'status': 'reviewing',
+        'date_updated': '2020-02-13T14:40:57Z',
+    }]
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        body = json.dumps({
+            'homeworks': self.homeworks,
+            'current_date': int(time.time()),
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ChangingPracticumStubHandler(PracticumStubHandler):
+    """Эндпоинт `homework_statuses`, где статус меняется на каждом запросе.
+
+    Каждый токен получает свою работу, так что каждый опрос
+    даёт одно уведомление.
+    """
+
+    polls = {}
+
+    def do_GET(self):
+        token = self.headers.get('Authorization', '').split()[-1]
+        poll = self.polls[token] = self.polls.get(token, -1) + 1
+        body = json.dumps({
+            'homeworks': [{
+                'id': token,
+                'homework_name': f'{token}__hw.zip',
+                'status': STATUSES[poll % len(STATUSES)],
+                'date_updated': f'2020-02-13T14:40:{poll % 60:02d}Z',
+            }],
+            'current_date': int(time.time()),
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HistoryStubHandler(PracticumStubHandler):
+    """Эндпоинт `homework_statuses` с длинной историей работ.
+
+    Тело из `history_size` работ пишется по частям без Content-Length
+    (HTTP/1.0, конец ответа — закрытие соединения) пачками по 1000
+    работ, так что заглушка сама не держит всю историю в памяти.
+    """
+
+    protocol_version = 'HTTP/1.0'
+    history_size = 1000
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{"homeworks": [')
+        for start in range(0, self.history_size, 1000):
+            self.wfile.write(', '.join(
+                json.dumps({
+                    'id': number,
+                    'homework_name': f'stub__hw_{number}.zip',
+                    'status': STATUSES[number % len(STATUSES)],
+                    'date_updated': '2020-02-13T14:40:57Z',
+                    'lesson_name': 'Итоговый проект',
+                    'reviewer_comment': 'Принято' * 10,
+                }, ensure_ascii=False)
+                for number in range(
+                    start, min(start + 1000, self.history_size)
+                )
+            ).encode() + (b', ' if start + 1000 < self.history_size else b''))
+        self.wfile.write(
+            f'], "current_date": {int(time.time())}}}'.encode()
+        )
+
+
+class TelegramStubHandler(PracticumStubHandler):
+    """Отвечает как метод `sendMessage` Telegram Bot API.
+
+    `latency` секунд задержки перед ответом изображают время ответа
+    настоящего Bot API.
+    """
+
+    message_ids = itertools.count(1)
+    latency = 0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps({'ok': True, 'result': {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(payload.get('chat_id', 0)), 'type': 'private'},
+            'text': payload.get('text', ''),
+        }}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer:
+    """Запускает HTTP-заглушку в фоновом потоке."""
+
+    def __init__(self, handler):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}/'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _serve(handler, ports):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+class StubProcess:
+    """Запускает HTTP-заглушку в отдельном процессе.
+
+    Так заглушка не делит с измеряемым кодом ни GIL, ни память,
+    и RSS процесса бенчмарка не включает её.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.process = None
+        self.port = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}/'
+
+    def __enter__(self):
+        ports = multiprocessing.Queue()
+        self.process = multiprocessing.Process(
+            target=_serve, args=(self.handler, ports), daemon=True
+        )
+        self.process.start()
+        self.port = ports.get(timeout=10)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.join()
+
+
+def percentile(values, percent):
+    """Перцентиль отсортированного списка."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
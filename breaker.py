@@ -0,0 +1,102 @@
+"""Автоматический выключатель для запросов к API Практикума."""
+import logging
+import os
+import threading
+import time
+
+import exceptions
+from metrics import METRICS
+
+BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 60))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Выключатель с состояниями closed, open и half-open.
+
+    В состоянии closed запросы проходят, подряд идущие сбои считаются.
+    После `failures` сбоев выключатель размыкается (open): запросы сразу
+    завершаются `CircuitOpenError`, не открывая соединений. Через
+    `reset_timeout` секунд выключатель пропускает один пробный запрос
+    (half-open): успех замыкает его, сбой снова размыкает. При нулевом
+    `failures` выключатель всегда замкнут.
+    """
+
+    __slots__ = (
+        'name', 'failures', 'reset_timeout', 'clock', 'state',
+        'failure_count', 'opened_at', '_lock',
+    )
+
+    def __init__(self, name, failures=BREAKER_FAILURES,
+                 reset_timeout=BREAKER_RESET_TIMEOUT, clock=time.monotonic):
+        """Автомат `name` с порогом ошибок и временем восстановления."""
+        self.name = name
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failure_count = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Пропускает запрос или бросает `CircuitOpenError`."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if (self.state == OPEN
+                    and self.clock() - self.opened_at >= self.reset_timeout):
+                self._set_state(HALF_OPEN)
+                return
+        METRICS.inc('breaker_rejected_total', breaker=self.kind)
+        raise exceptions.CircuitOpenError(
+            f'API недоступен, запросы приостановлены ({self.kind})'
+        )
+
+    def cancel(self):
+        """Возвращает в open пробный запрос, который не был выполнен."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def success(self):
+        """Отмечает успешный запрос."""
+        with self._lock:
+            self.failure_count = 0
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def failure(self):
+        """Отмечает сбой запроса."""
+        with self._lock:
+            self.failure_count += 1
+            if self.state == HALF_OPEN or (
+                    self.failures
+                    and self.failure_count >= self.failures
+                    and self.state == CLOSED):
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+
+    @property
+    def kind(self):
+        """Вид выключателя для метрик: имя без токена."""
+        return self.name.split(':', 1)[0]
+
+    def _set_state(self, state):
+        self.state = state
+        METRICS.inc(
+            'breaker_transitions_total', breaker=self.kind, state=state
+        )
+        if state == OPEN:
+            logger.warning(
+                f'Выключатель {self.kind} разомкнут на '
+                f'{self.reset_timeout} с после {self.failure_count} сбоев'
+            )
+        else:
+            logger.info(f'Выключатель {self.kind}: {state}')
@@ -0,0 +1,153 @@
+"""Запись ответов API и сообщений в кассету и виртуальные часы."""
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+CASSETTE_FILE = os.getenv('CASSETTE_FILE')
+
+logger = logging.getLogger(__name__)
+
+
+class VirtualClock:
+    """Часы, время на которых идёт только по вызову `sleep`.
+
+    Экземпляр вызывается как `time.monotonic` и подходит везде, где
+    принимается `clock`; `time()` — соответствующее время эпохи.
+    """
+
+    def __init__(self, start=None):
+        """Часы с нулём в момент эпохи `start`, по умолчанию сейчас."""
+        self.epoch = time.time() if start is None else start
+        self.now = 0.0
+
+    def __call__(self):
+        """Монотонное время на виртуальных часах."""
+        return self.now
+
+    def time(self):
+        """Текущее время эпохи на виртуальных часах."""
+        return self.epoch + self.now
+
+    def sleep(self, seconds):
+        """Мгновенно сдвигает часы на `seconds` секунд."""
+        self.now += max(0, seconds)
+
+
+class Recorder:
+    """Пишет в кассету ответы API и сообщения пользователям.
+
+    Кассета — файл JSON Lines. Запрос к API даёт строку с полем
+    `response` или `error`, каждое сообщение — строку с полями `message`
+    и `sent`. Токены в кассету не попадают: пользователь обозначен
+    ключом состояния. Пока запись не включена, `wrap` не вызывается.
+    """
+
+    def __init__(self):
+        """Запись выключена до вызова `start`."""
+        self.file = None
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Идёт ли запись."""
+        return self.file is not None
+
+    def start(self, path):
+        """Начинает дописывать кассету `path`."""
+        self.file = open(path, 'a', encoding='utf-8')
+        logger.info(f'Ответы API и сообщения записываются в {path}')
+
+    def stop(self):
+        """Закрывает кассету."""
+        file, self.file = self.file, None
+        if file is not None:
+            file.close()
+
+    def write(self, tenant, **fields):
+        """Дописывает в кассету одну строку."""
+        line = json.dumps(
+            {'tenant': tenant, 'at': time.time(), **fields},
+            ensure_ascii=False
+        )
+        with self.lock:
+            if self.file is not None:
+                self.file.write(line + '\n')
+                self.file.flush()
+
+    def wrap(self, tenant, fetch, send, send_error=None):
+        """Обёртки над функциями опроса, записывающие их результаты."""
+        def recorded_fetch(timestamp):
+            try:
+                response = fetch(timestamp)
+            except Exception as error:
+                self.write(tenant, from_date=timestamp, error=str(error))
+                raise
+            self.write(tenant, from_date=timestamp, response=response)
+            return response
+
+        def recording(func):
+            def recorded_send(message):
+                sent = func(message)
+                self.write(tenant, message=message, sent=bool(sent))
+                return sent
+            return recorded_send
+
+        return (
+            recorded_fetch, recording(send),
+            recording(send_error) if send_error is not None else None
+        )
+
+
+RECORDER = Recorder()
+
+
+def start_recording(path=CASSETTE_FILE):
+    """Включает запись кассеты, если задан путь."""
+    if path:
+        RECORDER.start(path)
+
+
+class Exchange:
+    """Один записанный запрос к API и сообщения после него."""
+
+    __slots__ = ('body', 'error', 'messages')
+
+    def __init__(self, body=None, error=None):
+        """Ответ API в виде текста JSON или текст ошибки."""
+        self.body = body
+        self.error = error
+        self.messages = []
+
+    def response(self):
+        """Новый экземпляр записанного ответа или записанная ошибка."""
+        if self.error is not None:
+            raise Exception(self.error)
+        return json.loads(self.body)
+
+
+def load_cassette(path):
+    """Записи кассеты по пользователям: `{ключ: [Exchange, ...]}`.
+
+    Ответ хранится текстом JSON и разбирается при каждом воспроизведении,
+    как разбирался бы ответ API.
+    """
+    tenants = defaultdict(list)
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            exchanges = tenants[record['tenant']]
+            if 'message' in record:
+                if exchanges:
+                    exchanges[-1].messages.append(
+                        (record['message'], record['sent'])
+                    )
+            elif 'error' in record:
+                exchanges.append(Exchange(error=record['error']))
+            else:
+                exchanges.append(Exchange(json.dumps(record['response'])))
+    return dict(tenants)
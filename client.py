@@ -0,0 +1,225 @@
+"""HTTP-клиент API Практикума с пулом соединений."""
+import hashlib
+import os
+import re
+
+import exceptions
+from breaker import CircuitBreaker
+from metrics import METRICS
+
+API_POOL_SIZE = int(os.getenv('API_POOL_SIZE', 1))
+API_TIMEOUT = float(os.getenv('API_TIMEOUT', 10))
+
+CURRENT_DATE_PATTERN = re.compile(rb'"current_date"\s*:\s*-?\d+')
+
+
+class PracticumClient:
+    """Клиент для запросов к эндпоинту API Практикума.
+
+    Запросы идут через общую `requests.Session` с пулом из `pool_size`
+    соединений: соединения держатся открытыми (keep-alive)
+    и переиспользуются между запросами и потоками. При нулевом
+    `pool_size` каждый запрос выполняется отдельным `requests.get`.
+    Библиотека requests импортируется при первом запросе.
+
+    Запросы проходят через выключатели эндпоинта и токена. Сетевые
+    ошибки, ответы 5xx и 429 считаются сбоями обоих, остальные ответы
+    4xx — сбоями только токена: так неработающий API останавливает
+    опрос всех пользователей, а отозванный токен — только своего.
+    """
+
+    def __init__(self, endpoint, pool_size=API_POOL_SIZE,
+                 timeout=API_TIMEOUT):
+        """Клиент эндпоинта `endpoint` с пулом соединений."""
+        self.endpoint = endpoint
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = None
+        self.breaker = CircuitBreaker('endpoint')
+        self._token_breakers = {}
+
+    @property
+    def session(self):
+        """Сессия с пулом соединений, создаётся при первом запросе."""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=self.pool_size,
+                pool_block=True,
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            self._session = session
+        return self._session
+
+    def token_breaker(self, headers):
+        """Выключатель токена из заголовка `Authorization`."""
+        token = headers.get('Authorization', '')
+        breaker = self._token_breakers.get(token)
+        if breaker is None:
+            breaker = self._token_breakers.setdefault(
+                token, CircuitBreaker(f'token:{token}')
+            )
+        return breaker
+
+    def get(self, headers, params, stream=False):
+        """GET-запрос к эндпоинту через выключатели.
+
+        При `stream` тело ответа не загружается сразу, его читают
+        по частям через `iter_content`.
+        """
+        token_breaker = self.token_breaker(headers)
+        token_breaker.allow()
+        try:
+            self.breaker.allow()
+        except exceptions.CircuitOpenError:
+            token_breaker.cancel()
+            raise
+        try:
+            response = self._get(headers, params, stream)
+        except Exception:
+            self.breaker.failure()
+            token_breaker.failure()
+            raise
+        status = response.status_code
+        if status >= 500 or status == 429:
+            self.breaker.failure()
+            token_breaker.failure()
+        else:
+            self.breaker.success()
+            if status >= 400:
+                token_breaker.failure()
+            else:
+                token_breaker.success()
+        return response
+
+    def _get(self, headers, params, stream):
+        """GET-запрос к эндпоинту с таймаутом и сжатием ответа."""
+        headers = dict(headers, **{'Accept-Encoding': 'gzip'})
+        if not self.pool_size:
+            import requests
+            return requests.get(
+                url=self.endpoint,
+                headers=headers,
+                params=params,
+                timeout=self.timeout,
+                stream=stream,
+            )
+        return self.session.get(
+            url=self.endpoint,
+            headers=headers,
+            params=params,
+            timeout=self.timeout,
+            stream=stream,
+        )
+
+    def close(self):
+        """Закрывает соединения пула."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class ResponseCache:
+    """Валидаторы последнего обработанного ответа API пользователя.
+
+    Запоминает `ETag` и `Last-Modified` для `from_date` последнего
+    ответа и хеш его тела. Хеш считается по байтам без `current_date`,
+    который меняется в каждом ответе: совпадение значит, что статусы
+    работ те же, и разбирать ответ не нужно. Курсор при этом не
+    сдвигается, так что следующий запрос снова идёт с тем же
+    `from_date` и может получить 304. Новые валидаторы вступают в силу
+    только после `commit()`, то есть когда ответ успешно обработан:
+    иначе неотправленное уведомление потерялось бы при следующем
+    совпадении. `commit()` получает курсор, сдвинутый по ответу, чтобы
+    валидаторы ушли со следующим запросом.
+
+    Полученные и сэкономленные байты и сэкономленное время разбора
+    считаются в полях и в счётчиках `METRICS`.
+    """
+
+    def __init__(self):
+        """Пустой кеш: первый запрос всегда безусловный."""
+        self.from_date = None
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self._pending = None
+        self.parse_seconds = 0.0
+        self.bytes_received = 0
+        self.bytes_saved = 0
+        self.parse_seconds_saved = 0.0
+
+    def request_headers(self, from_date):
+        """Заголовки условного запроса для `from_date`."""
+        if from_date != self.from_date:
+            return {}
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def is_unchanged(self, from_date, response):
+        """Проверяет, совпадает ли ответ с уже обработанным."""
+        content = getattr(response, 'content', None)
+        size = response_size(response)
+        self.bytes_received += size
+        METRICS.inc('api_bytes_received_total', size)
+        if response.status_code == 304:
+            self._skip(size)
+            return True
+        if not isinstance(content, bytes):
+            self._pending = None
+            return False
+        headers = getattr(response, 'headers', None) or {}
+        digest = hashlib.blake2b(
+            CURRENT_DATE_PATTERN.sub(b'', content), digest_size=16
+        ).digest()
+        self._pending = (
+            from_date,
+            headers.get('ETag'),
+            headers.get('Last-Modified'),
+            digest,
+        )
+        if digest == self.digest:
+            self._skip(len(content))
+            return True
+        return False
+
+    def _skip(self, size):
+        self.bytes_saved += size
+        self.parse_seconds_saved += self.parse_seconds
+        METRICS.inc('api_bytes_saved_total', size)
+        METRICS.inc('api_parse_seconds_saved_total', self.parse_seconds)
+
+    def commit(self, from_date=None):
+        """Принимает валидаторы успешно обработанного ответа.
+
+        `from_date` — курсор, с которым пойдёт следующий запрос; без
+        него валидаторы остаются у `from_date` обработанного ответа.
+        """
+        if self._pending is not None:
+            (self.from_date, self.etag,
+             self.last_modified, self.digest) = self._pending
+            self._pending = None
+        if from_date is not None:
+            self.from_date = from_date
+
+    def discard(self):
+        """Отбрасывает валидаторы ответа, который не удалось обработать."""
+        self._pending = None
+
+
+def response_size(response):
+    """Размер ответа на проводе: сжатый, если сервер его указал."""
+    headers = getattr(response, 'headers', None) or {}
+    length = headers.get('Content-Length')
+    if length and length.isdigit():
+        return int(length)
+    content = getattr(response, 'content', None)
+    return len(content) if isinstance(content, bytes) else 0
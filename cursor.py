@@ -0,0 +1,109 @@
+"""Хранение курсора `from_date` между перезапусками бота."""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+CURSOR_FLUSH_INTERVAL = float(os.getenv('CURSOR_FLUSH_INTERVAL', 0))
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write(path, data):
+    """Записывает файл целиком: читатель видит старую или новую версию."""
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class CursorStore:
+    """Курсоры `from_date` пользователей в JSON-файле.
+
+    Запись атомарная: данные пишутся во временный файл рядом и
+    подменяют основной через `os.replace`. При `flush_interval`
+    больше нуля изменения сбрасываются на диск не чаще этого
+    интервала, чтобы тысячи пользователей не переписывали файл
+    на каждой итерации; остаток сохраняет `flush()`.
+
+    С `shared` файл пишут несколько копий бота: перед записью курсоры
+    объединяются с файлом, чтобы не затереть более новые курсоры чужих
+    пользователей. Курсоры только растут, поэтому из двух значений
+    верно большее.
+    """
+
+    def __init__(self, path, flush_interval=CURSOR_FLUSH_INTERVAL,
+                 shared=False):
+        """Загружает курсоры из файла `path`."""
+        self.path = path
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self._cursors = self._load()
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                cursors = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as error:
+            logger.error(f'Не удалось прочитать курсоры {self.path}: {error}')
+            return {}
+        if not isinstance(cursors, dict):
+            logger.error(f'Некорректный файл курсоров {self.path}')
+            return {}
+        return cursors
+
+    def get(self, key, default=None):
+        """Возвращает сохранённый курсор пользователя."""
+        return self._cursors.get(str(key), default)
+
+    def set(self, key, value):
+        """Обновляет курсор и сохраняет его на диск."""
+        with self._lock:
+            self._cursors[str(key)] = value
+            self._dirty = True
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Сохраняет несохранённые изменения."""
+        with self._lock:
+            if not self._dirty:
+                return
+            if self.shared:
+                self._merge(self._load())
+            atomic_write(self.path, json.dumps(self._cursors))
+            self._dirty = False
+            self._flushed_at = time.monotonic()
+
+    def absorb(self, path, keys):
+        """Переносит из файла `path` курсоры `keys`, если они новее своих.
+
+        Курсоры только растут, поэтому из двух значений верно большее.
+        """
+        other = CursorStore(path)
+        with self._lock:
+            self._merge({key: other.get(key) for key in map(str, keys)})
+        self.flush()
+
+    def _merge(self, cursors):
+        for key, value in cursors.items():
+            current = self._cursors.get(key)
+            if isinstance(value, int) and (
+                    not isinstance(current, int) or value > current):
+                self._cursors[key] = value
+                self._dirty = True
@@ -0,0 +1,71 @@
+"""Объединение уведомлений о статусах в сводные сообщения."""
+import os
+
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 0))
+TELEGRAM_MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = '\n\n'
+
+
+def message_length(text):
+    """Длина сообщения так, как её считает Telegram: в единицах UTF-16."""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _cut(text, limit):
+    """Режет слишком длинный текст на куски не длиннее `limit`."""
+    pieces = []
+    while message_length(text) > limit:
+        end = limit
+        while message_length(text[:end]) > limit:
+            end -= 1
+        pieces.append(text[:end])
+        text = text[end:]
+    pieces.append(text)
+    return pieces
+
+
+def split_message(parts, limit=TELEGRAM_MESSAGE_LIMIT,
+                  separator=DIGEST_SEPARATOR):
+    """Склеивает части в как можно меньшее число сообщений.
+
+    Сообщение разрывается только между частями, когда следующая часть
+    не помещается в лимит Telegram; часть длиннее лимита режется.
+    """
+    messages = []
+    current = ''
+    for part in parts:
+        for piece in _cut(part, limit):
+            joined = f'{current}{separator}{piece}' if current else piece
+            if message_length(joined) <= limit:
+                current = joined
+                continue
+            messages.append(current)
+            current = piece
+    if current:
+        messages.append(current)
+    return messages
+
+
+class MessageBuffer:
+    """Копит уведомления одного чата до вызова `flush`."""
+
+    def __init__(self):
+        """Пустой буфер."""
+        self.parts = []
+
+    def add(self, text):
+        """Откладывает уведомление; всегда успешно."""
+        self.parts.append(text)
+        return True
+
+    def flush(self, send):
+        """Отправляет накопленное сводкой через `send`.
+
+        Возвращает False и не отправляет остаток, если одно из сообщений
+        сводки не отправилось.
+        """
+        parts, self.parts = self.parts, []
+        for text in split_message(parts):
+            if not send(text):
+                return False
+        return True
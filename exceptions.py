@@ -16,3 +16,13 @@ class MissedKeyException(Exception):
 class WrongDataFormat(Exception):
     """Некорректные данные."""
     pass
+
+
+class TenantConfigError(Exception):
+    """Некорректный файл с настройками пользователей."""
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Запросы к API приостановлены выключателем."""
+    pass
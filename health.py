@@ -0,0 +1,174 @@
+"""Пульс основного цикла и сторож, замечающий зависшие этапы."""
+import faulthandler
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+WATCHDOG_TIMEOUT = float(os.getenv('WATCHDOG_TIMEOUT', 300))
+WATCHDOG_EXIT = os.getenv('WATCHDOG_EXIT', '').lower() in ('1', 'true', 'yes')
+WATCHDOG_EXIT_CODE = 70
+HEALTH_FILE = os.getenv('HEALTH_FILE')
+
+logger = logging.getLogger(__name__)
+
+
+class Heartbeat:
+    """Отметки о работе этапов цикла.
+
+    `stage()` отмечает начало и конец этапа в текущем потоке, чтобы
+    сторож видел этапы, которые выполняются слишком долго. `beat()`
+    отмечает успешное завершение этапа, по нему считается возраст
+    последнего опроса и последней отправки. Отметка — запись в словарь
+    без блокировок, так что её можно ставить на каждой итерации.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """Пульс с часами `clock`."""
+        self.clock = clock
+        self.running = {}
+        self.last = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Отмечает выполнение этапа `name` в текущем потоке."""
+        key = (threading.get_ident(), name)
+        self.running[key] = self.clock()
+        try:
+            yield
+        finally:
+            self.running.pop(key, None)
+
+    def beat(self, name):
+        """Отмечает успешное завершение этапа `name`."""
+        self.last[name] = self.clock()
+
+    def stalled(self, timeout):
+        """Этапы, выполняющиеся дольше `timeout`: (поток, этап, секунды)."""
+        now = self.clock()
+        return [
+            (thread_id, name, now - started)
+            for (thread_id, name), started in list(self.running.items())
+            if now - started > timeout
+        ]
+
+    def status(self, timeout=WATCHDOG_TIMEOUT):
+        """Возраст последних успешных этапов и список зависших."""
+        now = self.clock()
+        stalled = self.stalled(timeout) if timeout else []
+        return {
+            'ok': not stalled,
+            'age': {
+                name: round(now - beaten, 3)
+                for name, beaten in list(self.last.items())
+            },
+            'stalled': [
+                {'stage': name, 'seconds': round(seconds, 3)}
+                for _, name, seconds in stalled
+            ],
+        }
+
+
+HEARTBEAT = Heartbeat()
+
+
+def format_stacks():
+    """Стеки всех потоков процесса в виде текста."""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    blocks = []
+    for thread_id, frame in sys._current_frames().items():
+        blocks.append(
+            f'Поток {names.get(thread_id, thread_id)}:\n'
+            + ''.join(traceback.format_stack(frame))
+        )
+    return '\n'.join(blocks)
+
+
+def write_health(path, status):
+    """Атомарно записывает состояние в JSON-файл `path`."""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(status, file, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+class Watchdog:
+    """Фоновый поток, проверяющий пульс раз в `interval` секунд.
+
+    Если этап выполняется дольше `timeout`, в лог пишутся стеки всех
+    потоков — по одному разу на зависание. С `exit_on_stall` процесс
+    после этого завершается с кодом `WATCHDOG_EXIT_CODE`, чтобы
+    платформа или супервизор шардов его перезапустили; стеки тогда
+    дублируются в stderr, потому что очередь лога уже не успеет
+    записаться. С `health_file` при каждой проверке в него пишется
+    `Heartbeat.status()`.
+    """
+
+    def __init__(self, heartbeat=HEARTBEAT, timeout=WATCHDOG_TIMEOUT,
+                 exit_on_stall=WATCHDOG_EXIT, health_file=HEALTH_FILE,
+                 interval=None):
+        """Сторож пульса `heartbeat` с порогом зависания `timeout`."""
+        self.heartbeat = heartbeat
+        self.timeout = timeout
+        self.exit_on_stall = exit_on_stall
+        self.health_file = health_file
+        self.interval = interval or min(timeout / 4, 15)
+        self.reported = set()
+
+    def check(self):
+        """Одна проверка; возвращает список зависших этапов."""
+        stalled = self.heartbeat.stalled(self.timeout)
+        if self.health_file:
+            try:
+                write_health(
+                    self.health_file, self.heartbeat.status(self.timeout)
+                )
+            except OSError as error:
+                logger.warning(f'Файл состояния не записан: {error}')
+        fresh = [
+            (thread_id, name, seconds)
+            for thread_id, name, seconds in stalled
+            if (thread_id, name) not in self.reported
+        ]
+        self.reported = {(thread_id, name) for thread_id, name, _ in stalled}
+        if fresh:
+            self.on_stall(fresh)
+        return stalled
+
+    def on_stall(self, stalled):
+        """Сообщает о зависании и при необходимости завершает процесс."""
+        stages = ', '.join(
+            f'{name} ({seconds:.0f} с)' for _, name, seconds in stalled
+        )
+        logger.error(f'Этапы выполняются дольше {self.timeout:.0f} с: '
+                     f'{stages}\n{format_stacks()}')
+        if self.exit_on_stall:
+            faulthandler.dump_traceback(sys.stderr, all_threads=True)
+            sys.stderr.flush()
+            os._exit(WATCHDOG_EXIT_CODE)
+
+    def run(self):
+        """Проверяет пульс, пока процесс жив."""
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def start(self):
+        """Запускает проверки в фоновом потоке."""
+        thread = threading.Thread(target=self.run, name='watchdog',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+
+def start_watchdog(timeout=WATCHDOG_TIMEOUT, health_file=HEALTH_FILE):
+    """Включает сторожа, если `timeout` не равен нулю."""
+    if not timeout:
+        return None
+    watchdog = Watchdog(timeout=timeout, health_file=health_file)
+    watchdog.start()
+    return watchdog
@@ -1,26 +1,70 @@
+import json
 import logging
 import os
+import sys
+import threading
 import time
 from http import HTTPStatus
 from json import JSONDecodeError
 
 import exceptions
-import requests
-import telegram
-from dotenv import load_dotenv
+from alerts import ErrorReporter, root_error
+from cassette import RECORDER
+from client import PracticumClient, ResponseCache, response_size
+from cursor import CursorStore
+from digest import DIGEST_WINDOW, MessageBuffer
+from health import HEARTBEAT
+from leases import REPLICA_LEASES, start_leases
+from lifecycle import LIFECYCLE
+from metrics import METRICS
+from profiling import PROFILER
+from scheduler import create_scheduler
+from storage import MemoryStatusStore, StatusStore, homework_key
+from webhook import (WEBHOOK_PORT, WEBHOOK_RECONCILE_PERIOD, WebhookReceiver,
+                     serve_webhook)
 
-load_dotenv()
+
+def load_env(override=False):
+    """Загружает переменные из .env.
+
+    Библиотека python-dotenv импортируется, только если файл есть
+    в рабочей директории или рядом с ботом: на сервере переменные
+    обычно заданы окружением, и импорт не нужен. При `override`
+    значения из файла заменяют уже заданные.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    for directory in (os.getcwd(), here):
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path, override=override)
+            return
+
+
+load_env()
 
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TENANTS_FILE = os.getenv('TENANTS_FILE')
+VERDICTS_FILE = os.getenv('VERDICTS_FILE')
+STATE_DIR = os.getenv('STATE_DIR', '.')
+CURSOR_FILE = os.path.join(STATE_DIR, 'cursor.json')
+STORE_FILE = os.path.join(STATE_DIR, 'homework.db')
+OUTBOX_FILE = os.path.join(STATE_DIR, 'outbox.json')
+DEFAULT_TENANT = 'default'
+RUN_ONCE = False
 
-RETRY_PERIOD = 600
+RETRY_PERIOD = int(os.getenv('RETRY_PERIOD', 600))
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 
+API_CLIENT = PracticumClient(ENDPOINT)
+API_CACHE = ResponseCache()
+
+
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
@@ -28,16 +72,48 @@ HOMEWORK_VERDICTS = {
 }
 
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    filename='program.log',
-    filemode='w',
-    format='%(asctime)s - %(levelname)s - %(message)s - %(name)s'
-)
 logger = logging.getLogger(__name__)
-logger.addHandler(
-    logging.StreamHandler()
-)
+
+
+def load_verdicts(path):
+    """Тексты вердиктов из JSON-файла вида `{"status": "текст"}`."""
+    with open(path, encoding='utf-8') as file:
+        verdicts = json.load(file)
+    if not isinstance(verdicts, dict) or not all(
+            isinstance(text, str) for text in verdicts.values()):
+        raise exceptions.WrongDataFormat(
+            f'Файл вердиктов {path} должен содержать словарь строк'
+        )
+    return verdicts
+
+
+if VERDICTS_FILE:
+    HOMEWORK_VERDICTS.update(load_verdicts(VERDICTS_FILE))
+
+
+def reload_settings():
+    """Перечитывает .env, период опроса и тексты вердиктов на лету.
+
+    Ошибка в файле вердиктов логируется, прежние тексты остаются.
+    """
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID
+    global HEADERS, RETRY_PERIOD, VERDICTS_FILE
+    load_env(override=True)
+    PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
+    TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+    HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+    if os.getenv('RETRY_PERIOD'):
+        RETRY_PERIOD = int(os.getenv('RETRY_PERIOD'))
+    VERDICTS_FILE = os.getenv('VERDICTS_FILE')
+    if VERDICTS_FILE:
+        try:
+            verdicts = load_verdicts(VERDICTS_FILE)
+        except (OSError, ValueError, exceptions.WrongDataFormat) as error:
+            logger.error(f'Тексты вердиктов не обновлены: {error}')
+        else:
+            HOMEWORK_VERDICTS.update(verdicts)
+    logger.info('Настройки перечитаны')
 
 
 def check_tokens():
@@ -54,44 +130,127 @@ def check_tokens():
     return True
 
 
-def send_message(bot, message):
-    """Функция для отправки сообщения в чат Telegram."""
+@METRICS.timed('send_message')
+def send_message_to(bot, chat_id, message):
+    """Функция для отправки сообщения в указанный чат Telegram."""
+    import telegram
+    started = time.perf_counter()
     try:
-        bot.send_message(TELEGRAM_CHAT_ID, message)
+        with HEARTBEAT.stage('send'):
+            bot.send_message(chat_id, message)
+        HEARTBEAT.beat('send')
         logger.debug(
-            f'Сообщение в чат отправлено: {message}'
+            'Сообщение отправлено в чат %s', chat_id,
+            extra={'event': 'message_sent', 'stage': 'send_message',
+                   'latency': time.perf_counter() - started}
         )
         return True
     except telegram.TelegramError as telegram_error:
+        METRICS.inc(
+            'errors_total',
+            stage='send_message',
+            error=type(telegram_error).__name__
+        )
         logger.error(
-            f'Сообщение в чат не отправлено: {telegram_error}'
+            'Сообщение в чат не отправлено: %s', telegram_error,
+            extra={'event': 'send_failed', 'stage': 'send_message',
+                   'error': type(telegram_error).__name__}
         )
 
 
-def get_api_answer(timestamp):
-    """Функция для запроса к эндпоинту API-сервиса."""
+def send_message(bot, message):
+    """Функция для отправки сообщения в чат Telegram."""
+    return send_message_to(bot, TELEGRAM_CHAT_ID, message)
+
+
+@METRICS.timed('get_api_answer')
+def request_homeworks(headers, timestamp, client=None, cache=None):
+    """Функция для запроса к API-сервису с заголовками пользователя.
+
+    С `cache` запрос условный: если ответ не изменился с последнего
+    обработанного, возвращается None без разбора JSON.
+    """
+    import requests
     params = {'from_date': timestamp}
     try:
-        homework_status = requests.get(
-            url=ENDPOINT,
-            headers=HEADERS,
-            params=params
+        if cache is not None:
+            headers = dict(headers, **cache.request_headers(timestamp))
+        homework_status = (client or API_CLIENT).get(headers, params)
+        METRICS.inc(
+            'api_responses_total', status=homework_status.status_code
         )
+        if cache is not None and cache.is_unchanged(
+                timestamp, homework_status):
+            logger.debug(
+                'Ответ API не изменился, сэкономлено на разборе %.6f с',
+                cache.parse_seconds,
+                extra={'event': 'api_unchanged', 'stage': 'get_api_answer'}
+            )
+            METRICS.inc('api_unchanged_total')
+            return None
         if homework_status.status_code != HTTPStatus.OK:
-            logger.error('Ошбика при запросе к API')
+            METRICS.inc(
+                'errors_total',
+                stage='get_api_answer',
+                error=f'http_{homework_status.status_code}'
+            )
+            logger.error(
+                'Ошбика при запросе к API',
+                extra={'event': 'api_failed', 'stage': 'get_api_answer',
+                       'error': f'http_{homework_status.status_code}'}
+            )
             raise Exception('Ошбика при запросе к API')
-        return homework_status.json()
-    except requests.exceptions.RequestException:
-        logger.error('Эндпоинт не найден')
+        started = time.perf_counter()
+        response = homework_status.json()
+        if cache is not None:
+            cache.parse_seconds = time.perf_counter() - started
+            logger.debug(
+                'Ответ API: %s байт, разбор %.6f с',
+                response_size(homework_status), cache.parse_seconds,
+                extra={'event': 'api_response', 'stage': 'get_api_answer',
+                       'latency': cache.parse_seconds}
+            )
+        return response
+    except exceptions.CircuitOpenError as error:
+        logger.debug(
+            'Запрос к API не выполнен: %s', error,
+            extra={'event': 'circuit_open', 'stage': 'get_api_answer',
+                   'error': type(error).__name__}
+        )
+        raise
+    except requests.exceptions.RequestException as error:
+        METRICS.inc(
+            'errors_total',
+            stage='get_api_answer',
+            error=type(error).__name__
+        )
+        logger.error(
+            'Эндпоинт не найден',
+            extra={'event': 'api_failed', 'stage': 'get_api_answer',
+                   'error': type(error).__name__}
+        )
         raise Exception('Эндпоинт не найден')
     except JSONDecodeError:
-        logger.error('Ошибка преобразования в JSON')
+        METRICS.inc(
+            'errors_total', stage='get_api_answer', error='JSONDecodeError'
+        )
+        logger.error(
+            'Ошибка преобразования в JSON',
+            extra={'event': 'api_failed', 'stage': 'get_api_answer',
+                   'error': 'JSONDecodeError'}
+        )
         raise Exception('Ошибка преобразования в JSON')
     except Exception as error:
         logger.error(f'API error: {error}')
         raise Exception(f'API error: {error}')
 
 
+def get_api_answer(timestamp):
+    """Функция для запроса к эндпоинту API-сервиса."""
+    return request_homeworks(HEADERS, timestamp, cache=API_CACHE)
+
+
+@METRICS.timed('check_response')
 def check_response(response: dict) -> list:
     """Проверяет полученный ответ на корректность."""
     if not isinstance(response, dict):
@@ -104,13 +263,13 @@ def check_response(response: dict) -> list:
     if not isinstance(homeworks_list, list):
         logging.error('Некорректный ответ')
         raise TypeError('Некорректный ответ')
-    homework = homeworks_list[0]
-    if not homeworks_list:
-        logging.error('Список с домашними работами пуст')
-        raise ValueError('Список с домашними работами пуст')
-    return homework
+    if not all(isinstance(homework, dict) for homework in homeworks_list):
+        logging.error('Домашние работы должны быть словарями')
+        raise TypeError('Домашние работы должны быть словарями')
+    return homeworks_list
 
 
+@METRICS.timed('parse_status')
 def parse_status(homework):
     """Функция для проверки статуса о выполнении ДЗ."""
     if not isinstance(homework, dict):
@@ -129,32 +288,321 @@ def parse_status(homework):
     return f'Изменился статус проверки работы "{homework_name}". {verdict}'
 
 
+class TenantState:
+    """Состояние опроса одного пользователя между итерациями.
+
+    `clock` — монотонные часы для планировщика и сводок ошибок,
+    например `cassette.VirtualClock` при воспроизведении кассеты.
+    С `leases` (`leases.LeaseKeeper`) пользователь опрашивается, только
+    пока эта копия бота держит его аренду.
+    """
+
+    def __init__(self, timestamp, cursors=None, key=DEFAULT_TENANT,
+                 store=None, cache=None, clock=time.monotonic, leases=None):
+        """Состояние с курсором `timestamp` или сохранённым в `cursors`."""
+        self.key = key
+        self.clock = clock
+        self.leases = leases
+        self.cache = cache if cache is not None else ResponseCache()
+        self.cursors = cursors
+        self.store = store if store is not None else MemoryStatusStore()
+        if cursors is not None:
+            timestamp = cursors.get(key, timestamp)
+        self.timestamp = timestamp
+        self.last_message = ''
+        self.errors = ErrorReporter(clock=clock)
+        self.failures = 0
+        self.pending = set()
+        self.changed_at = clock()
+        self.lock = threading.RLock()
+
+    def advance(self, current_date):
+        """Сдвигает курсор `from_date` на `current_date` из ответа API."""
+        if not isinstance(current_date, int) or current_date <= self.timestamp:
+            return
+        self.timestamp = current_date
+        if self.cursors is not None:
+            self.cursors.set(self.key, current_date)
+
+    def fence(self, send):
+        """`send`, который молчит, пока аренда пользователя у другой копии."""
+        if self.leases is None:
+            return send
+        return self.leases.fence(self.key, send)
+
+    def changed(self, homeworks):
+        """Работы, о статусе которых пользователь ещё не уведомлён."""
+        return self.store.changed(self.key, homeworks)
+
+    def remember(self, homework, message):
+        """Запоминает отправленное уведомление о статусе."""
+        self.last_message = message
+        self.store.remember(self.key, homework)
+        self.changed_at = self.clock()
+        if homework.get('status') == 'reviewing':
+            self.pending.add(homework_key(homework))
+        else:
+            self.pending.discard(homework_key(homework))
+
+
+def handle_response(state, response, send, send_error=None, digest=False):
+    """Проверяет ответ API и уведомляет об изменившихся работах.
+
+    Уведомления уходят по одному в порядке `date_updated`. Возвращает
+    False, если отправить уведомление не удалось: оставшиеся работы
+    будут обработаны в следующий раз. Работа, статус которой не удалось
+    разобрать, считается увиденной, чтобы не останавливать остальные:
+    об ошибке пользователь узнаёт через `state.errors` и `send_error`.
+    С `digest` уведомления уходят одной сводкой, и работы запоминаются,
+    только если отправилась вся сводка.
+    """
+    with state.lock:
+        homeworks = check_response(response)
+        updates = []
+        for homework in state.changed(homeworks):
+            try:
+                message = parse_status(homework)
+            except Exception as error:
+                skip_homework(state, homework, error, send_error or send)
+                continue
+            if digest:
+                updates.append((homework, message))
+                continue
+            if not send(message):
+                return False
+            remember_status(state, homework, message)
+        if updates:
+            buffer = MessageBuffer()
+            for _, message in updates:
+                buffer.add(message)
+            if not buffer.flush(send):
+                return False
+            for homework, message in updates:
+                remember_status(state, homework, message)
+    return True
+
+
+def remember_status(state, homework, message):
+    """Запоминает отправленное уведомление о статусе работы."""
+    state.remember(homework, message)
+    logger.debug(
+        'Новый статус работы %s: %s',
+        homework.get('homework_name'), homework.get('status'),
+        extra={'event': 'status_changed', 'tenant': state.key,
+               'homework_id': homework_key(homework),
+               'status': homework.get('status')}
+    )
+
+
+def skip_homework(state, homework, error, send_error):
+    """Запоминает работу с неразобранным статусом и сообщает об ошибке."""
+    logger.error(
+        'Статус работы %s не разобран: %s', homework_key(homework), error,
+        extra={'event': 'parse_failed', 'tenant': state.key,
+               'stage': 'parse_status', 'homework_id': homework_key(homework),
+               'status': homework.get('status'),
+               'error': type(error).__name__}
+    )
+    state.store.remember(state.key, homework)
+    report_error(state, error, 'parse_status', send_error)
+
+
+def report_error(state, error, stage, send_error):
+    """Сообщает пользователю об ошибке, если это не повтор.
+
+    Группа ошибки в `state.errors` остаётся, только если сообщение
+    отправлено, иначе о ней сообщится на следующей итерации.
+    """
+    message = state.errors.report(error, stage)
+    if message is not None and not send_error(message):
+        state.errors.reset(error, stage)
+
+
+def poll_once(state, fetch, send, send_error=None, digest=False):
+    """Одна итерация опроса API и отправки уведомлений пользователю.
+
+    Если уведомление отправить не удалось, курсор не сдвигается.
+    Сообщения об ошибках проходят через `state.errors`: повторы одной
+    ошибки копятся и приходят сводкой. Они отправляются через
+    `send_error`, если он задан. Этап отмечается в `HEARTBEAT`, чтобы
+    сторож заметил зависший запрос. При включённой записи кассеты
+    ответы API и сообщения попадают в неё, а по SIGUSR1 итерация
+    профилируется. Если аренда пользователя у другой копии бота,
+    итерация пропускается, а потеря аренды посреди итерации
+    останавливает отправку. С `digest` уведомления итерации уходят
+    одной сводкой.
+    """
+    if state.leases is not None:
+        if not state.leases.holds(state.key):
+            return
+        send = state.fence(send)
+        if send_error is not None:
+            send_error = state.fence(send_error)
+    if RECORDER.enabled:
+        fetch, send, send_error = RECORDER.wrap(
+            state.key, fetch, send, send_error
+        )
+    with HEARTBEAT.stage('poll'), PROFILER.iteration():
+        _poll_once(state, fetch, send, send_error, digest)
+
+
+def _poll_once(state, fetch, send, send_error, digest):
+    stage = 'get_api_answer'
+    try:
+        response = fetch(state.timestamp)
+        HEARTBEAT.beat('poll')
+        if response is None:
+            state.failures = 0
+            return
+        stage = 'handle_response'
+        if not handle_response(state, response, send, send_error, digest):
+            state.cache.discard()
+            return
+        state.advance(response.get('current_date'))
+        state.cache.commit(state.timestamp)
+        state.failures = 0
+    except Exception as error:
+        state.cache.discard()
+        state.failures += 1
+        logger.error(
+            'Сбой в работе программы: %s', error,
+            extra={'event': 'poll_failed', 'tenant': state.key,
+                   'stage': stage, 'error': type(root_error(error)).__name__}
+        )
+        report_error(state, error, stage, send_error or send)
+    finally:
+        state.errors.flush(send_error or send)
+
+
 def main():
-    """Основная логика работы бота."""
+    """Основная логика работы бота.
+
+    При `RUN_ONCE` выполняется одна итерация опроса, после чего функция
+    возвращается: так бота можно запускать по расписанию из cron.
+    При `DIGEST_WINDOW` уведомления, найденные за одну итерацию,
+    уходят одним сообщением. SIGHUP перечитывает настройки между
+    итерациями, SIGTERM прерывает ожидание и завершает цикл, сохранив
+    курсор и закрыв соединения. При `REPLICA_LEASES` несколько копий
+    бота могут работать одновременно: опрашивает та, у которой аренда.
+    """
     if not check_tokens():
         logger.critical('Необходимые переменные окружения отсутствуют')
         raise exceptions.TokenError('Tokens Error')
+    import telegram
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
-    last_message = ''
-    previous_message = None
-    while True:
-        try:
-            response = get_api_answer(timestamp)
-            check = check_response(response)
-            message = parse_status(check)
-            if last_message != message:
-                last_message = message
-                send_message(bot, last_message)
-        except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            logger.error(message)
-            if message != previous_message and send_message(
-                    bot, message):
-                previous_message = message
-        finally:
-            time.sleep(RETRY_PERIOD)
+    run_polling(bot, sleep=lambda delay: time.sleep(delay))
+
+
+def run_polling(bot, clock=time.monotonic, sleep=time.sleep):
+    """Цикл опроса единственного пользователя из `main`.
+
+    Ожидание между итерациями — `sleep`, время планировщика и
+    группировки ошибок — `clock`; тесты и `replay` подставляют сюда
+    виртуальные часы.
+    """
+    state = TenantState(
+        int(time.time()),
+        CursorStore(CURSOR_FILE),
+        store=StatusStore(STORE_FILE),
+        cache=API_CACHE,
+        clock=clock,
+        leases=(
+            start_leases(STORE_FILE, [DEFAULT_TENANT]) if REPLICA_LEASES
+            else None
+        )
+    )
+    scheduler = create_scheduler(RETRY_PERIOD, clock=clock)
+
+    def send(message):
+        return send_message(bot, message)
+
+    webhook = start_webhook(state, send)
+    if webhook is not None:
+        scheduler = create_scheduler(WEBHOOK_RECONCILE_PERIOD, clock=clock)
+    while not LIFECYCLE.stopping:
+        poll_once(state, get_api_answer, send, send, bool(DIGEST_WINDOW))
+        if RUN_ONCE:
+            break
+        if LIFECYCLE.take_reload():
+            bot = reload_bot(bot)
+            if webhook is None:
+                scheduler.period = RETRY_PERIOD
+        delay = scheduler.next_delay(state)
+        if LIFECYCLE.idle:
+            with LIFECYCLE.interruptible():
+                sleep(delay)
+    if state.leases is not None:
+        state.leases.stop()
+    state.cursors.flush()
+    state.store.close()
+    API_CLIENT.close()
+    logger.info('Бот остановлен')
+
+
+def start_webhook(state, send):
+    """Принимает статусы пользователя по webhook, если задан `WEBHOOK_PORT`.
+
+    Возвращает None, если webhook не нужен или порт занят. Присланные
+    статусы отправляются, только пока аренда пользователя у этой копии
+    бота, иначе webhook отвечает 503.
+    """
+    if not WEBHOOK_PORT or RUN_ONCE:
+        return None
+    receiver = WebhookReceiver(handle_response)
+    receiver.subscribe(state.key, state, state.fence(send))
+    return serve_webhook(receiver)
+
+
+def reload_bot(bot):
+    """Перечитывает настройки; новый бот, если сменился токен Telegram."""
+    token = TELEGRAM_TOKEN
+    reload_settings()
+    if TELEGRAM_TOKEN == token:
+        return bot
+    import telegram
+    return telegram.Bot(token=TELEGRAM_TOKEN)
 
 
 if __name__ == '__main__':
-    main()
+    import argparse
+
+    from logs import setup_logging
+    from cassette import start_recording
+    from health import start_watchdog
+    from metrics import start_metrics
+    from profiling import start_profiling
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--once', action='store_true',
+        help='выполнить одну итерацию опроса и завершиться'
+    )
+    parser.add_argument(
+        '--backfill', action='store_true',
+        help='загрузить историю статусов без отправки сообщений'
+    )
+    args = parser.parse_args()
+    RUN_ONCE = args.once
+    setup_logging()
+    start_metrics()
+    start_watchdog()
+    start_recording()
+    start_profiling()
+    sys.modules.setdefault('homework', sys.modules[__name__])
+    LIFECYCLE.install()
+    if args.backfill:
+        import backfill
+        backfill.main(TENANTS_FILE)
+    elif TENANTS_FILE:
+        import shards
+        import tenants
+        iterations = 1 if RUN_ONCE else None
+        if shards.SHARD_WORKERS > 1:
+            shards.main(
+                TENANTS_FILE, iterations=iterations, lifecycle=LIFECYCLE
+            )
+        else:
+            tenants.main(
+                TENANTS_FILE, iterations=iterations, lifecycle=LIFECYCLE
+            )
+    else:
+        main()
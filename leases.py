@@ -0,0 +1,200 @@
+"""Аренда пользователей между копиями бота, работающими одновременно.
+
+Копии бота на одной машине делят `STATE_DIR`: в базе статусов лежит
+таблица аренды, и каждого пользователя опрашивает только копия,
+держащая его аренду. Остальные стоят в резерве и забирают аренду,
+когда владелец перестаёт её продлевать.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+REPLICA_LEASES = os.getenv('REPLICA_LEASES', '').lower() in (
+    '1', 'true', 'yes'
+)
+LEASE_TTL = float(os.getenv('LEASE_TTL', 6))
+REPLICA_ID = os.getenv('REPLICA_ID', '')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leases (
+    tenant TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID
+'''
+
+logger = logging.getLogger(__name__)
+
+
+def replica_id():
+    """Имя копии бота: `REPLICA_ID` или уникальное для процесса.
+
+    `socket` и `uuid` импортируются здесь: аренда по умолчанию выключена,
+    и импорт `homework` не должен за неё платить.
+    """
+    if REPLICA_ID:
+        return REPLICA_ID
+    import socket
+    import uuid
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def replica_path(path, owner):
+    """Путь к файлу копии `owner` рядом с общим файлом `path`."""
+    root, extension = os.path.splitext(path)
+    name = ''.join(
+        char if char.isalnum() or char in '-_.' else '-' for char in owner
+    )
+    return f'{root}.{name}{extension}'
+
+
+class LeaseTable:
+    """Таблица аренды в SQLite.
+
+    Аренда продлевается владельцем и переходит к другой копии, только
+    когда её срок истёк. Захват и продление — одна транзакция на пачку
+    пользователей, так что две копии не получат одного пользователя.
+    Время — `time.time`, общее для процессов одной машины.
+    """
+
+    def __init__(self, path, owner=None, ttl=LEASE_TTL, clock=time.time):
+        """Таблица аренды в базе `path` от имени копии `owner`."""
+        self.owner = owner or replica_id()
+        self.ttl = ttl
+        self.clock = clock
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=1
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(SCHEMA)
+        self._lock = threading.Lock()
+
+    def acquire(self, keys):
+        """Продлевает свою аренду и захватывает свободную.
+
+        Возвращает ключи, которые теперь принадлежат этой копии.
+        """
+        now = self.clock()
+        keys = [str(key) for key in keys]
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._connection.executemany(
+                    'INSERT INTO leases (tenant, owner, expires) '
+                    'VALUES (?, ?, ?) ON CONFLICT (tenant) DO UPDATE SET '
+                    'owner = excluded.owner, expires = excluded.expires '
+                    'WHERE leases.owner = excluded.owner '
+                    'OR leases.expires < ?',
+                    ((key, self.owner, now + self.ttl, now) for key in keys),
+                )
+                rows = self._connection.execute(
+                    'SELECT tenant FROM leases WHERE owner = ?',
+                    (self.owner,),
+                ).fetchall()
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+        wanted = set(keys)
+        return {tenant for tenant, in rows if tenant in wanted}
+
+    def release(self, keys=None):
+        """Отдаёт аренду `keys` или всю аренду этой копии."""
+        with self._lock:
+            if keys is None:
+                self._connection.execute(
+                    'DELETE FROM leases WHERE owner = ?', (self.owner,)
+                )
+                return
+            self._connection.executemany(
+                'DELETE FROM leases WHERE tenant = ? AND owner = ?',
+                ((str(key), self.owner) for key in keys),
+            )
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
+
+
+class LeaseKeeper:
+    """Фоновое продление аренды пользователей `keys`.
+
+    Аренда продлевается каждые `ttl / 3` секунд. Своей копия считает
+    аренду до `ttl - interval` секунд после последнего продления, то
+    есть перестаёт отправлять сообщения раньше, чем другая копия сможет
+    аренду забрать. Резервная копия забирает аренду умершей не позже
+    чем через `ttl + interval` секунд. `keys` читается на каждом шаге,
+    поэтому это может быть живое представление ключей словаря.
+    """
+
+    def __init__(self, table, keys, clock=time.time):
+        """Продление аренды в таблице `table` по часам `clock`."""
+        self.table = table
+        self.keys = keys
+        self.clock = clock
+        self.interval = table.ttl / 3
+        self.valid_until = {}
+        self.stopped = threading.Event()
+        self._thread = None
+
+    def holds(self, key):
+        """Принадлежит ли пользователь `key` этой копии сейчас."""
+        return self.valid_until.get(str(key), 0) > self.clock()
+
+    def fence(self, key, send):
+        """`send`, который ничего не отправляет после потери аренды."""
+        def fenced(message):
+            return self.holds(key) and send(message)
+        return fenced
+
+    def renew(self):
+        """Один шаг продления и захвата аренды."""
+        started = self.clock()
+        try:
+            held = self.table.acquire(list(self.keys))
+        except sqlite3.Error as error:
+            logger.warning(f'Аренда не продлена: {error}')
+            return
+        valid_until = started + self.table.ttl - self.interval
+        for key in set(self.valid_until) - held:
+            logger.info(f'Аренда пользователя {key} потеряна')
+        for key in held - set(self.valid_until):
+            logger.info(f'Аренда пользователя {key} получена')
+        self.valid_until = dict.fromkeys(held, valid_until)
+
+    def run(self):
+        """Продлевает аренду до вызова `stop`."""
+        while not self.stopped.is_set():
+            self.renew()
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        """Получает аренду и запускает её продление в фоновом потоке."""
+        self.renew()
+        self._thread = threading.Thread(
+            target=self.run, name='leases', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Останавливает продление и сразу отдаёт аренду резерву."""
+        self.stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.valid_until = {}
+        try:
+            self.table.release()
+        except sqlite3.Error as error:
+            logger.warning(f'Аренда не освобождена: {error}')
+        self.table.close()
+
+
+def start_leases(path, keys):
+    """Запускает продление аренды `keys` в базе `path`."""
+    keeper = LeaseKeeper(LeaseTable(path), keys).start()
+    logger.info(f'Копия {keeper.table.owner}: аренда пользователей включена')
+    return keeper
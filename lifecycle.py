@@ -0,0 +1,88 @@
+"""Перезагрузка настроек по SIGHUP и плавная остановка по SIGTERM."""
+import os
+import signal
+from contextlib import contextmanager
+
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 25))
+
+
+class _Wakeup(BaseException):
+    """Сигнал прервал ожидание в `Lifecycle.interruptible`."""
+
+
+class Lifecycle:
+    """Флаги остановки и перезагрузки, которые выставляют сигналы.
+
+    Обработчики сигналов только выставляют флаги и будят подписчиков
+    из `listeners`, а работу доделывает основной цикл. Логировать
+    в обработчике нельзя: он может прервать поток, который уже держит
+    блокировку очереди лога. Если основной поток в этот момент ждёт
+    внутри `interruptible()`, ожидание прерывается сразу, а не по
+    истечении таймаута.
+    """
+
+    def __init__(self):
+        """Бот работает, запросов на перезагрузку нет."""
+        self.stopping = False
+        self.reload_requested = False
+        self.listeners = []
+        self._interruptible = False
+
+    def install(self):
+        """Назначает обработчики SIGTERM, SIGINT и SIGHUP."""
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._on_reload)
+
+    @property
+    def idle(self):
+        """Нет ни запроса на остановку, ни запроса на перезагрузку."""
+        return not (self.stopping or self.reload_requested)
+
+    def stop(self):
+        """Просит основной цикл остановиться."""
+        self.stopping = True
+        self._wake()
+
+    def request_reload(self):
+        """Просит основной цикл перечитать настройки."""
+        self.reload_requested = True
+        self._wake()
+
+    def take_reload(self):
+        """Сбрасывает запрос на перезагрузку; True, если он был."""
+        requested, self.reload_requested = self.reload_requested, False
+        return requested
+
+    def _on_stop(self, signum, frame):
+        self.stop()
+        self._interrupt()
+
+    def _on_reload(self, signum, frame):
+        self.request_reload()
+        self._interrupt()
+
+    def _wake(self):
+        for listener in self.listeners:
+            listener()
+
+    def _interrupt(self):
+        if self._interruptible:
+            self._interruptible = False
+            raise _Wakeup
+
+    @contextmanager
+    def interruptible(self):
+        """Ожидание внутри блока прерывается сигналом."""
+        try:
+            self._interruptible = True
+            yield
+            self._interruptible = False
+        except _Wakeup:
+            pass
+        finally:
+            self._interruptible = False
+
+
+LIFECYCLE = Lifecycle()
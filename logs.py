@@ -0,0 +1,150 @@
+"""Настройка логирования без блокировки основного цикла."""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+LOG_FILE = os.getenv('LOG_FILE', 'program.log')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')
+LOG_JSON = os.getenv('LOG_JSON', '').lower() in ('1', 'true', 'yes')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s - %(name)s'
+LOG_FIELDS = (
+    'event', 'tenant', 'stage', 'homework_id', 'status', 'latency', 'error'
+)
+
+
+def parse_sampling(value):
+    """Разбирает настройку вида `DEBUG=0.1,INFO=0.5,message_sent=0.01`.
+
+    Ключ — имя уровня или тип события из поля `event` записи.
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        key, _, rate = item.partition('=')
+        key = key.strip()
+        level = logging.getLevelName(key.upper())
+        rates[level if isinstance(level, int) else key] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает заданную долю записей каждого события или уровня.
+
+    Доля для типа события важнее доли для уровня: так частые события
+    вроде `message_sent` можно прорежать, не теряя редких записей
+    того же уровня.
+    """
+
+    def __init__(self, rates):
+        """Доли `rates` пропускаемых записей по событиям и уровням."""
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        """Решает, попадёт ли запись в лог."""
+        rate = self.rates.get(getattr(record, 'event', None))
+        if rate is None:
+            rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON с постоянным набором полей.
+
+    Кроме времени, уровня, логгера и текста в запись попадают поля
+    `LOG_FIELDS`, переданные через `extra`, если они заданы.
+    """
+
+    def format(self, record):
+        """Запись в виде строки JSON."""
+        entry = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Кладёт записи в очередь и отбрасывает их, если очередь полна."""
+
+    def __init__(self, log_queue):
+        """Обработчик, пишущий записи в очередь `log_queue`."""
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        """Кладёт запись в очередь, не дожидаясь свободного места."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def gzip_namer(name):
+    """Имя архива для ротированного файла лога."""
+    return f'{name}.gz'
+
+
+def gzip_rotator(source, dest):
+    """Сжимает ротированный файл лога."""
+    with open(source, 'rb') as source_file:
+        with gzip.open(dest, 'wb') as dest_file:
+            shutil.copyfileobj(source_file, dest_file)
+    os.remove(source)
+
+
+def setup_logging(level=LOG_LEVEL, filename=LOG_FILE,
+                  max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                  sampling=LOG_SAMPLING, queue_size=LOG_QUEUE_SIZE,
+                  json_format=LOG_JSON):
+    """Настраивает корневой логгер.
+
+    Записи из рабочих потоков только кладутся в очередь, а пишет их
+    на диск и в консоль отдельный поток `QueueListener`. Файл лога
+    ротируется по размеру, старые файлы сжимаются gzip. С `json_format`
+    записи пишутся строками JSON (`JsonFormatter`).
+    """
+    file_handler = RotatingFileHandler(
+        filename, maxBytes=max_bytes, backupCount=backup_count,
+        encoding='utf-8'
+    )
+    file_handler.namer = gzip_namer
+    file_handler.rotator = gzip_rotator
+    formatter = (
+        JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT)
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    log_queue = queue.Queue(queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sampling(sampling)))
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    root.handlers = [queue_handler]
+    listener = QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,253 @@
+"""Счётчики и гистограммы задержек этапов работы бота."""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from health import HEARTBEAT
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_DUMP_INTERVAL = float(os.getenv('METRICS_DUMP_INTERVAL', 0))
+METRICS_PREFIX = 'homework_'
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """Гистограмма с верхними границами корзин `buckets`."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Добавляет наблюдение."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, share):
+        """Оценка квантиля по верхней границе корзины."""
+        rank = share * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('"', '\\"'))
+        for key, value in pairs
+    ) + '}'
+
+
+class Metrics:
+    """Реестр метрик.
+
+    Обновление метрики — поиск в словаре и прибавление под общей
+    блокировкой, так что замеры можно не отключать в основном цикле.
+    """
+
+    def __init__(self):
+        """Пустой реестр метрик."""
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """Увеличивает счётчик."""
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Добавляет наблюдение в гистограмму."""
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter(self, name, **labels):
+        """Текущее значение счётчика."""
+        return self._counters.get((name, _labels(labels)), 0)
+
+    def histogram(self, name, **labels):
+        """Гистограмма или None, если наблюдений не было."""
+        return self._histograms.get((name, _labels(labels)))
+
+    @contextmanager
+    def timer(self, stage):
+        """Замеряет длительность этапа и считает его ошибки по классам."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as error:
+            self.inc('stage_errors_total', stage=stage,
+                     error=type(error).__name__)
+            raise
+        finally:
+            self.observe(
+                'stage_seconds', time.perf_counter() - started, stage=stage
+            )
+
+    def timed(self, stage):
+        """Декоратор, замеряющий функцию как этап `stage`."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (key, list(histogram.counts), histogram.sum, histogram.count,
+                 histogram.buckets)
+                for key, histogram in self._histograms.items()
+            )
+        typed = set()
+        for (name, labels), value in counters:
+            name = METRICS_PREFIX + name
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+        for (name, labels), counts, total, count, buckets in histograms:
+            name = METRICS_PREFIX + name
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'{name}_bucket{_format_labels(labels, le=bound)} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self):
+        """Краткая текстовая сводка для лога."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items())
+        lines = [
+            f'{name}{_format_labels(labels)} = {value}'
+            for (name, labels), value in counters
+        ]
+        lines.extend(
+            f'{name}{_format_labels(labels)}: count={histogram.count} '
+            f'avg={histogram.sum / histogram.count:.4f}s '
+            f'p50<={histogram.quantile(0.5)}s p99<={histogram.quantile(0.99)}s'
+            for (name, labels), histogram in histograms
+        )
+        return '\n'.join(lines)
+
+
+METRICS = Metrics()
+
+
+class MetricsHandler:
+    """Отдаёт метрики по адресу `/metrics` и пульс по адресу `/health`.
+
+    Примешивается к `BaseHTTPRequestHandler` при запуске сервера, чтобы
+    импорт модуля не тянул за собой `http.server`. `/health` отвечает
+    кодом 503, если какой-то этап завис.
+    """
+
+    metrics = METRICS
+    heartbeat = HEARTBEAT
+
+    def do_GET(self):
+        """Ответ на запрос метрик или пульса."""
+        path = self.path.split('?')[0]
+        if path == '/metrics':
+            self.respond(
+                200, self.metrics.render(), 'text/plain; version=0.0.4'
+            )
+        elif path == '/health':
+            status = self.heartbeat.status()
+            self.respond(
+                200 if status['ok'] else 503, json.dumps(status),
+                'application/json'
+            )
+        else:
+            self.send_error(404)
+
+    def respond(self, code, text, content_type):
+        """Отправляет ответ с телом `text`."""
+        body = text.encode()
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Запросы к метрикам не логируются."""
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """Запускает HTTP-сервер метрик в фоновом потоке."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    handler = type(
+        'MetricsRequestHandler', (MetricsHandler, BaseHTTPRequestHandler), {}
+    )
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics-http', daemon=True
+    ).start()
+    logger.info(f'Метрики доступны на http://{host}:{port}/metrics')
+    return server
+
+
+def dump_metrics_periodically(interval, metrics=METRICS):
+    """Раз в `interval` секунд пишет сводку метрик в лог."""
+    def run():
+        while True:
+            time.sleep(interval)
+            logger.info(f'Метрики:\n{metrics.dump()}')
+
+    thread = threading.Thread(target=run, name='metrics-dump', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_metrics(port=METRICS_PORT, dump_interval=METRICS_DUMP_INTERVAL):
+    """Включает выдачу метрик, заданную настройками."""
+    if port:
+        serve_metrics(port)
+    if dump_interval:
+        dump_metrics_periodically(dump_interval)
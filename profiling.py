@@ -0,0 +1,219 @@
+"""Профилирование по запросу: cProfile по SIGUSR1, tracemalloc по SIGUSR2."""
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_ITERATIONS = int(os.getenv('PROFILE_ITERATIONS', 100))
+PROFILE_ON_START = os.getenv('PROFILE_ON_START', '').lower() in (
+    '1', 'true', 'yes'
+)
+PROFILE_FILE = os.getenv('PROFILE_FILE', 'profile.txt')
+PROFILE_FUNCTIONS = (
+    'get_api_answer', 'request_homeworks', 'check_response', 'parse_status',
+    'send_message',
+)
+PROFILE_TOP = 30
+MEMORY_TRACE_ON_START = os.getenv('MEMORY_TRACE_ON_START', '').lower() in (
+    '1', 'true', 'yes'
+)
+MEMORY_TRACE_INTERVAL = float(os.getenv('MEMORY_TRACE_INTERVAL', 300))
+MEMORY_TRACE_FILE = os.getenv('MEMORY_TRACE_FILE', 'memory.txt')
+MEMORY_TRACE_FRAMES = 5
+MEMORY_TRACE_TOP = 20
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    """Профилирует следующие `iterations` итераций опроса.
+
+    С Python 3.12 `cProfile` работает через `sys.monitoring`: профиль
+    один на процесс и видит все потоки, а второй включить нельзя. Поэтому
+    с `shared` (по умолчанию, если есть `sys.monitoring`) первая
+    запрошенная итерация включает общий профиль, а последняя выключает.
+    Без него каждая итерация профилируется отдельным `cProfile.Profile`
+    в своём потоке и результаты складываются в общую статистику, так что
+    многопользовательский режим профилируется в обоих случаях. Если
+    профиль включить не удалось, итерация просто не профилируется.
+    Когда итерации
+    кончаются, статистика по функциям опроса и общий топ пишутся
+    в `path`, а сырые данные для snakeviz — в `path` с суффиксом
+    `.prof`. Пока профилирование не запрошено, итерация стоит одной
+    проверки счётчика, а `cProfile` и `pstats` даже не импортируются.
+    """
+
+    def __init__(self, path=PROFILE_FILE, iterations=PROFILE_ITERATIONS,
+                 shared=None):
+        """Профилировщик, пишущий отчёт в `path`."""
+        self.path = path
+        self.iterations = iterations
+        self.shared = hasattr(sys, 'monitoring') if shared is None else shared
+        self.remaining = 0
+        self.requested = 0
+        self.profile = None
+        self.stats = None
+        self.lock = threading.Lock()
+
+    def request(self, iterations=None):
+        """Включает профилирование следующих итераций."""
+        self.requested = self.remaining = iterations or self.iterations
+
+    @contextmanager
+    def iteration(self):
+        """Профилирует итерацию внутри блока, если это запрошено."""
+        if not self.remaining:
+            yield
+            return
+        profile = self.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                self.collect(profile)
+
+    def enable(self):
+        """Профиль итерации или None, если его не включить."""
+        import cProfile
+        with self.lock:
+            if self.shared and self.profile is not None:
+                return self.profile
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as error:
+                logger.debug(f'Итерация не профилируется: {error}')
+                return None
+            if self.shared:
+                self.profile = profile
+            return profile
+
+    def collect(self, profile):
+        """Учитывает итерацию; после последней пишет отчёт."""
+        import pstats
+        with self.lock:
+            if self.shared:
+                if profile is not self.profile or not self.remaining:
+                    return
+                self.remaining -= 1
+                if self.remaining:
+                    return
+                profile.disable()
+                self.profile = None
+                stats = pstats.Stats(profile)
+            else:
+                profile.disable()
+                if not self.remaining:
+                    return
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+                self.remaining -= 1
+                if self.remaining:
+                    return
+                stats, self.stats = self.stats, None
+        self.dump(stats)
+
+    def dump(self, stats):
+        """Пишет отчёт профилирования в файл."""
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats('cumulative')
+        stream.write(f'Профиль {self.requested} итераций, '
+                     f'{time.strftime("%Y-%m-%d %H:%M:%S")}\n')
+        stats.print_stats('|'.join(PROFILE_FUNCTIONS))
+        stats.print_stats(PROFILE_TOP)
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(stream.getvalue())
+        stats.dump_stats(f'{self.path}.prof')
+        logger.info(f'Профиль записан в {self.path}')
+
+    def _on_signal(self, signum, frame):
+        self.request()
+
+
+class MemoryTracer:
+    """Раз в `interval` секунд снимает tracemalloc и пишет прирост.
+
+    В `path` дописывается топ строк кода по приросту памяти с прошлого
+    снимка. Работает в фоновом потоке; сигнал только переключает флаг
+    `enabled`, а запускает и останавливает tracemalloc сам поток
+    на следующем шаге.
+    """
+
+    def __init__(self, path=MEMORY_TRACE_FILE,
+                 interval=MEMORY_TRACE_INTERVAL, top=MEMORY_TRACE_TOP):
+        """Трассировка в файл `path` раз в `interval` секунд."""
+        self.path = path
+        self.interval = interval
+        self.top = top
+        self.enabled = False
+        self.snapshot = None
+
+    def check(self):
+        """Один шаг: снимок и запись прироста или остановка."""
+        import tracemalloc
+        if not self.enabled:
+            if self.snapshot is not None:
+                self.snapshot = None
+                tracemalloc.stop()
+                logger.info('Трассировка памяти выключена')
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+            logger.info(f'Трассировка памяти включена, отчёт в {self.path}')
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ))
+        if self.snapshot is not None:
+            self.write(snapshot.compare_to(self.snapshot, 'lineno'))
+        self.snapshot = snapshot
+
+    def write(self, differences):
+        """Дописывает в файл топ прироста памяти."""
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f'{time.strftime("%Y-%m-%d %H:%M:%S")}: '
+            f'{current / 1024 / 1024:.2f} MiB, '
+            f'пик {peak / 1024 / 1024:.2f} MiB'
+        ]
+        lines.extend(
+            f'  {difference}' for difference in differences[:self.top]
+        )
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('\n'.join(lines) + '\n')
+
+    def run(self):
+        """Снимает трассировку, пока процесс жив."""
+        while True:
+            self.check()
+            time.sleep(self.interval)
+
+    def _on_signal(self, signum, frame):
+        self.enabled = not self.enabled
+
+
+PROFILER = Profiler()
+
+
+def start_profiling(profile_file=PROFILE_FILE,
+                    memory_file=MEMORY_TRACE_FILE):
+    """Назначает SIGUSR1 и SIGUSR2 и запускает поток трассировки памяти."""
+    import signal
+    PROFILER.path = profile_file
+    if PROFILE_ON_START:
+        PROFILER.request()
+    tracer = MemoryTracer(memory_file)
+    tracer.enabled = MEMORY_TRACE_ON_START
+    threading.Thread(
+        target=tracer.run, name='memory-trace', daemon=True
+    ).start()
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, PROFILER._on_signal)
+        signal.signal(signal.SIGUSR2, tracer._on_signal)
+    return tracer
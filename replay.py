@@ -0,0 +1,219 @@
+"""Воспроизведение кассеты на виртуальных часах.
+
+Цикл опроса многопользовательского режима (`tenants.poll_loop`
+с `homework.poll_once` и планировщиком) прогоняется на записанных
+ответах API без сети и без ожидания: неделя опроса тысяч
+пользователей занимает секунды. Так проверяются пропускная способность
+и память, а при воспроизведении один к одному — что бот отправляет
+те же сообщения, что были записаны.
+
+Запуск из корня репозитория:
+
+    python replay.py cassette.jsonl --copies 1000 --days 7
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+import homework
+from cassette import VirtualClock, load_cassette
+from scheduler import SCHEDULER, create_scheduler
+from storage import MemoryStatusStore
+from tenants import poll_loop
+
+WEEK = 7 * 86400
+
+
+class ReplayReport:
+    """Итоги воспроизведения."""
+
+    def __init__(self):
+        """Пустые итоги."""
+        self.polls = 0
+        self.messages = 0
+        self.failures = 0
+        self.mismatches = []
+        self.virtual_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    @property
+    def polls_per_second(self):
+        """Опросов в секунду реального времени."""
+        return self.polls / self.wall_seconds if self.wall_seconds else 0.0
+
+    def __str__(self):
+        """Итоги одной строкой для вывода в консоль."""
+        return (
+            f'опросов {self.polls}, сообщений {self.messages}, '
+            f'ошибок {self.failures}, расхождений {len(self.mismatches)}; '
+            f'{self.virtual_seconds / 86400:.1f} сут за '
+            f'{self.wall_seconds:.2f} с '
+            f'({self.polls_per_second:.0f} опросов/с)'
+        )
+
+
+class VirtualTimers:
+    """Паузы циклов опроса на виртуальных часах `clock`.
+
+    `sleep` не ждёт: корутина встаёт в очередь таймеров, а `run` будит
+    их по порядку, сдвигая часы. Итерации опроса при воспроизведении
+    не уходят в пул потоков, так что к следующему таймеру разбуженная
+    корутина уже снова ждёт.
+    """
+
+    def __init__(self, clock):
+        """Пустая очередь таймеров на часах `clock`."""
+        self.clock = clock
+        self._timers = []
+        self._counter = itertools.count()
+
+    async def sleep(self, delay):
+        """Ждёт `delay` секунд виртуального времени."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._timers, (self.clock() + delay, next(self._counter), future)
+        )
+        await future
+
+    async def run(self, tasks, end):
+        """Будит таймеры до момента `end`, затем останавливает `tasks`."""
+        await asyncio.sleep(0)
+        while self._timers and self._timers[0][0] < end:
+            due, _, future = heapq.heappop(self._timers)
+            self.clock.sleep(due - self.clock())
+            future.set_result(None)
+            await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ReplayTenant:
+    """Пользователь, которому API отвечает записями из кассеты.
+
+    С `cycle` записи повторяются по кругу, иначе пользователь
+    выбывает после последней. Без `cycle` отправленные сообщения
+    сверяются с записанными.
+    """
+
+    def __init__(self, state, exchanges, report, cycle=False):
+        """Пользователь с состоянием `state` и записями `exchanges`."""
+        self.state = state
+        self.exchanges = exchanges
+        self.report = report
+        self.cycle = cycle
+        self.index = 0
+        self.sent = []
+
+    def fetch(self, timestamp):
+        """Следующий записанный ответ API."""
+        exchange = self.exchanges[self.index % len(self.exchanges)]
+        self.index += 1
+        try:
+            return exchange.response()
+        except Exception:
+            self.report.failures += 1
+            raise
+
+    def send(self, message):
+        """Засчитывает сообщение; успех отправки — как при записи."""
+        self.report.messages += 1
+        if self.cycle:
+            return True
+        self.sent.append(message)
+        recorded = self.exchanges[self.index - 1].messages
+        if len(self.sent) <= len(recorded):
+            return recorded[len(self.sent) - 1][1]
+        return True
+
+    @property
+    def iterations(self):
+        """Число опросов: по записям или без ограничения."""
+        return None if self.cycle else len(self.exchanges)
+
+    async def poll(self):
+        """Одна итерация опроса со сверкой сообщений."""
+        self.sent = []
+        self.report.polls += 1
+        homework.poll_once(self.state, self.fetch, self.send)
+        if self.cycle:
+            return
+        expected = [
+            message for message, _ in self.exchanges[self.index - 1].messages
+        ]
+        if self.sent != expected:
+            self.report.mismatches.append(
+                (self.state.key, self.index - 1, expected, self.sent)
+            )
+
+
+def replay(cassette, copies=1, duration=WEEK, period=None,
+           scheduler=SCHEDULER, clock=None, cycle=None):
+    """Прогоняет опрос записанных пользователей на виртуальных часах.
+
+    `cassette` — результат `load_cassette`. Каждый записанный
+    пользователь размножается `copies` раз; первые опросы копий
+    распределены по периоду, как в многопользовательском режиме.
+    По умолчанию записи повторяются по кругу, если копий больше одной.
+    """
+    clock = clock or VirtualClock()
+    period = homework.RETRY_PERIOD if period is None else period
+    scheduler = create_scheduler(period, scheduler, clock=clock)
+    cycle = copies > 1 if cycle is None else cycle
+    store = MemoryStatusStore()
+    report = ReplayReport()
+    sources = [
+        (f'{key}#{copy}' if copies > 1 else key, exchanges)
+        for copy in range(copies)
+        for key, exchanges in cassette.items() if exchanges
+    ]
+    timers = VirtualTimers(clock)
+
+    async def run():
+        tasks = []
+        for number, (key, exchanges) in enumerate(sources):
+            state = homework.TenantState(
+                int(clock.time()), key=key, store=store, clock=clock
+            )
+            tenant = ReplayTenant(state, exchanges, report, cycle)
+            tasks.append(asyncio.ensure_future(poll_loop(
+                state, tenant.poll, scheduler, timers.sleep,
+                number * period / len(sources), tenant.iterations
+            )))
+        await timers.run(tasks, clock() + duration)
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    report.wall_seconds = time.perf_counter() - started
+    report.virtual_seconds = clock()
+    return report
+
+
+def main():
+    """Воспроизводит кассету и печатает итоги."""
+    import argparse
+    import resource
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('cassette')
+    parser.add_argument('--copies', type=int, default=1)
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--period', type=float)
+    parser.add_argument('--scheduler', default=SCHEDULER)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    cassette = load_cassette(args.cassette)
+    report = replay(
+        cassette, copies=args.copies, duration=args.days * 86400,
+        period=args.period, scheduler=args.scheduler
+    )
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'{report}; пик RSS {rss:.1f} MiB')
+    for key, index, expected, sent in report.mismatches[:10]:
+        print(f'{key} #{index}: ожидалось {expected}, отправлено {sent}')
+    return 1 if report.mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
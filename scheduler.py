@@ -0,0 +1,88 @@
+"""Планировщики интервала между запросами к API."""
+import os
+import random
+import time
+
+SCHEDULER = os.getenv('SCHEDULER', 'fixed')
+SCHEDULER_FLOOR = float(os.getenv('SCHEDULER_FLOOR', 60))
+SCHEDULER_REVIEWING_PERIOD = float(
+    os.getenv('SCHEDULER_REVIEWING_PERIOD', 120)
+)
+SCHEDULER_IDLE_AFTER = float(os.getenv('SCHEDULER_IDLE_AFTER', 86400))
+SCHEDULER_IDLE_MAX = float(os.getenv('SCHEDULER_IDLE_MAX', 3600))
+SCHEDULER_FAILURE_MAX = float(os.getenv('SCHEDULER_FAILURE_MAX', 3600))
+
+
+class FixedScheduler:
+    """Запросы через равные промежутки времени."""
+
+    def __init__(self, period, clock=time.monotonic):
+        """Опрос раз в `period` секунд."""
+        self.period = period
+
+    def next_delay(self, state):
+        """Пауза перед следующим запросом пользователя."""
+        return self.period
+
+
+class AdaptiveScheduler:
+    """Интервал опроса в зависимости от состояния пользователя.
+
+    Пока у пользователя есть работа на проверке (`reviewing`), API
+    опрашивается раз в `reviewing_period`. Если статусы не менялись
+    дольше `idle_after`, интервал растёт на `period` за каждый такой
+    промежуток, но не больше `idle_max`. После ошибок интервал
+    удваивается (не больше `failure_max`) со случайным разбросом,
+    чтобы пользователи не повторяли запросы одновременно. Интервал
+    никогда не бывает меньше `floor`. Давность изменений считается
+    по часам `clock`.
+    """
+
+    def __init__(self, period, floor=SCHEDULER_FLOOR,
+                 reviewing_period=SCHEDULER_REVIEWING_PERIOD,
+                 idle_after=SCHEDULER_IDLE_AFTER,
+                 idle_max=SCHEDULER_IDLE_MAX,
+                 failure_max=SCHEDULER_FAILURE_MAX, clock=time.monotonic):
+        """Планировщик с обычным периодом `period` и минимумом `floor`."""
+        self.period = period
+        self.clock = clock
+        self.floor = floor
+        self.reviewing_period = reviewing_period
+        self.idle_after = idle_after
+        self.idle_max = max(idle_max, period)
+        self.failure_max = max(failure_max, period)
+
+    def next_delay(self, state):
+        """Пауза перед следующим запросом пользователя."""
+        if state.failures:
+            delay = self.failure_delay(state.failures)
+        elif state.pending:
+            delay = self.reviewing_period
+        else:
+            delay = self.idle_delay(self.clock() - state.changed_at)
+        return max(self.floor, delay)
+
+    def failure_delay(self, failures):
+        """Экспоненциальная пауза со случайным разбросом после ошибок."""
+        ceiling = min(
+            self.failure_max, self.period * 2 ** min(failures - 1, 32)
+        )
+        return random.uniform(self.period, ceiling)
+
+    def idle_delay(self, idle_seconds):
+        """Пауза для пользователя, у которого давно ничего не менялось."""
+        steps = int(idle_seconds // self.idle_after)
+        return min(self.idle_max, self.period * (1 + steps))
+
+
+SCHEDULERS = {
+    'fixed': FixedScheduler,
+    'adaptive': AdaptiveScheduler,
+}
+
+
+def create_scheduler(period, name=SCHEDULER, clock=time.monotonic):
+    """Создаёт планировщик по имени из настройки `SCHEDULER`."""
+    if name not in SCHEDULERS:
+        raise ValueError(f'Неизвестный планировщик {name}')
+    return SCHEDULERS[name](period, clock=clock)
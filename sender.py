@@ -0,0 +1,411 @@
+"""Очередь исходящих сообщений Telegram с ограничением частоты."""
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+import telegram
+from cursor import atomic_write
+from digest import DIGEST_WINDOW, split_message
+from health import HEARTBEAT
+from metrics import METRICS
+
+TELEGRAM_RATE = float(os.getenv('TELEGRAM_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+SEND_MAX_ATTEMPTS = int(os.getenv('SEND_MAX_ATTEMPTS', 5))
+TELEGRAM_SEND_WORKERS = int(os.getenv('TELEGRAM_SEND_WORKERS', 4))
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', 8))
+
+STATUS_PRIORITY = 0
+ERROR_PRIORITY = 1
+
+logger = logging.getLogger(__name__)
+
+
+def create_bot(token, pool_size=TELEGRAM_POOL_SIZE, **kwargs):
+    """Бот с пулом из `pool_size` keep-alive соединений к Bot API.
+
+    По умолчанию python-telegram-bot держит одно соединение, и
+    параллельные отправки из нескольких потоков открывали бы новые.
+    """
+    from telegram.utils.request import Request
+    return telegram.Bot(
+        token=token, request=Request(con_pool_size=pool_size), **kwargs
+    )
+
+
+def send_failed(error):
+    """Поля записи лога о неудачной отправке."""
+    return {'event': 'send_failed', 'stage': 'send_message',
+            'error': type(error).__name__}
+
+
+class TokenBucket:
+    """Корзина токенов: не больше `rate` событий в секунду."""
+
+    def __init__(self, rate, capacity=None):
+        """Полная корзина на `capacity` токенов."""
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def delay(self, now):
+        """Сколько секунд ждать до следующего токена."""
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        return max(wait, self.blocked_until - now)
+
+    def consume(self):
+        """Забирает токен."""
+        self.tokens -= 1
+
+    def block(self, until):
+        """Запрещает события до момента `until`."""
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class OutgoingMessage:
+    """Сообщение в очереди на отправку."""
+
+    __slots__ = ('chat_id', 'text', 'priority', 'attempts', 'number')
+
+    def __init__(self, chat_id, text, priority):
+        """Сообщение `text` для чата `chat_id`."""
+        self.chat_id = chat_id
+        self.text = text
+        self.priority = priority
+        self.attempts = 0
+        self.number = None
+
+
+class DigestMessage(OutgoingMessage):
+    """Уведомления о статусах для одного чата, копящиеся до отправки."""
+
+    __slots__ = ('parts',)
+
+    def __init__(self, chat_id, text, priority):
+        """Сводка, начатая уведомлением `text`."""
+        super().__init__(chat_id, text, priority)
+        self.parts = [text]
+
+
+class SendQueue:
+    """Очередь отправки сообщений в Telegram.
+
+    Сообщения отправляют `workers` потоков, так что задержка Bot API
+    не ограничивает пропускную способность одним сообщением за раз.
+    В один чат одновременно отправляется не больше одного сообщения,
+    поэтому порядок сообщений чата сохраняется. Общая корзина токенов
+    держит частоту в пределах глобального лимита Telegram, корзины
+    чатов — в пределах лимита на чат; сообщение для занятого чата ждёт,
+    не задерживая остальные чаты. Уведомления о статусах уходят раньше
+    сообщений об ошибках, внутри одного приоритета порядок сохраняется.
+    На `RetryAfter` чат блокируется на `retry_after` секунд и сообщение
+    возвращается в очередь; сетевые ошибки повторяются до
+    `max_attempts` раз, и чат до повтора тоже блокируется. Повторное
+    сообщение сохраняет своё место в очереди, поэтому следующие
+    сообщения чата не уходят раньше него. Остальные ошибки Telegram
+    логируются.
+
+    При `digest_window` больше нуля уведомления о статусах для чата
+    копятся `digest_window` секунд с первого из них и уходят одним
+    сообщением, которое делится только по лимиту длины Telegram.
+
+    Сообщения, не отправленные до `close`, сохраняет в файл `save`,
+    а после перезапуска возвращает в очередь `load`. Удаляется только
+    файл, который очередь сама прочитала или записала.
+    """
+
+    def __init__(self, bot, rate=TELEGRAM_RATE, chat_rate=TELEGRAM_CHAT_RATE,
+                 max_attempts=SEND_MAX_ATTEMPTS, digest_window=DIGEST_WINDOW,
+                 workers=TELEGRAM_SEND_WORKERS):
+        """Запускает `workers` потоков отправки через `bot`."""
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.max_attempts = max_attempts
+        self.digest_window = digest_window
+        self._digests = {}
+        self.bucket = TokenBucket(rate)
+        self.chat_buckets = {}
+        self._ready = []
+        self._delayed = []
+        self._parked = {}
+        self._sending = set()
+        self._counter = itertools.count()
+        self._in_flight = set()
+        self._closed = False
+        self._stopped = False
+        self._outboxes = set()
+        self._condition = threading.Condition()
+        self._threads = [
+            threading.Thread(
+                target=self._run, name=f'telegram-sender-{number}',
+                daemon=True
+            )
+            for number in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, chat_id, text, priority=STATUS_PRIORITY):
+        """Ставит сообщение в очередь; False, если очередь закрыта."""
+        with self._condition:
+            if self._closed:
+                return False
+            if self.digest_window and priority == STATUS_PRIORITY:
+                self._add_to_digest(chat_id, text, priority)
+            else:
+                self._push(OutgoingMessage(chat_id, text, priority))
+            self._condition.notify()
+        return True
+
+    def _add_to_digest(self, chat_id, text, priority):
+        digest = self._digests.get(chat_id)
+        if digest is not None:
+            digest.parts.append(text)
+            return
+        digest = self._digests[chat_id] = DigestMessage(
+            chat_id, text, priority
+        )
+        self._push(digest, time.monotonic() + self.digest_window)
+
+    def _render_digest(self, message):
+        """Собирает сводку чата, если окно накопления закончилось."""
+        if self._digests.get(message.chat_id) is not message:
+            return
+        del self._digests[message.chat_id]
+        texts = split_message(message.parts)
+        METRICS.inc('digest_parts_total', len(message.parts))
+        METRICS.inc('digest_messages_total', len(texts))
+        message.text = texts[0]
+        for text in texts[1:]:
+            self._push(
+                OutgoingMessage(message.chat_id, text, message.priority)
+            )
+
+    def __len__(self):
+        """Число сообщений в очереди, включая отправляемые."""
+        with self._condition:
+            return (
+                len(self._ready) + len(self._delayed) + len(self._in_flight)
+                + sum(map(len, self._parked.values()))
+            )
+
+    def _push(self, message, ready_at=None):
+        if message.number is None:
+            message.number = next(self._counter)
+        item = (message.priority, message.number, message)
+        if ready_at is None:
+            heapq.heappush(self._ready, item)
+        else:
+            heapq.heappush(self._delayed, (ready_at, *item))
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(
+                self.chat_rate, capacity=1
+            )
+        return bucket
+
+    def _next_message(self):
+        """Ждёт сообщение, которое можно отправить прямо сейчас."""
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    heapq.heappush(
+                        self._ready, heapq.heappop(self._delayed)[1:]
+                    )
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                if self._ready:
+                    wait = self.bucket.delay(now)
+                    if wait <= 0:
+                        message = self._take(now)
+                        if message is not None:
+                            return message
+                        continue
+                    timeout = wait if timeout is None else min(timeout, wait)
+                elif self._closed and not self._delayed and not self._parked:
+                    return None
+                self._condition.wait(timeout)
+            return None
+
+    def _take(self, now):
+        """Достаёт первое готовое сообщение; None, если его чат занят."""
+        item = heapq.heappop(self._ready)
+        message = item[2]
+        if message.chat_id in self._sending:
+            self._parked.setdefault(message.chat_id, []).append(item)
+            return None
+        self._render_digest(message)
+        chat_bucket = self._chat_bucket(message.chat_id)
+        wait = chat_bucket.delay(now)
+        if wait > 0:
+            self._push(message, now + wait)
+            return None
+        self.bucket.consume()
+        chat_bucket.consume()
+        self._sending.add(message.chat_id)
+        self._in_flight.add(message)
+        return message
+
+    def _run(self):
+        while True:
+            message = self._next_message()
+            if message is None:
+                return
+            try:
+                self._deliver(message)
+            finally:
+                with self._condition:
+                    self._in_flight.discard(message)
+                    self._sending.discard(message.chat_id)
+                    for item in self._parked.pop(message.chat_id, ()):
+                        heapq.heappush(self._ready, item)
+                    self._condition.notify_all()
+
+    def _deliver(self, message):
+        message.attempts += 1
+        started = time.perf_counter()
+        try:
+            with METRICS.timer('send_message'), HEARTBEAT.stage('send'):
+                self.bot.send_message(message.chat_id, message.text)
+            HEARTBEAT.beat('send')
+            logger.debug(
+                'Сообщение отправлено в чат %s', message.chat_id,
+                extra={'event': 'message_sent', 'stage': 'send_message',
+                       'latency': time.perf_counter() - started}
+            )
+        except telegram.error.RetryAfter as error:
+            logger.warning(
+                f'Превышен лимит Telegram для чата {message.chat_id}, '
+                f'повтор через {error.retry_after} с'
+            )
+            ready_at = time.monotonic() + error.retry_after
+            with self._condition:
+                self._chat_bucket(message.chat_id).block(ready_at)
+                self._push(message, ready_at)
+        except telegram.error.BadRequest as error:
+            logger.error(
+                'Сообщение в чат не отправлено: %s', error,
+                extra=send_failed(error)
+            )
+        except telegram.error.NetworkError as error:
+            if message.attempts >= self.max_attempts:
+                logger.error(
+                    'Сообщение в чат не отправлено: %s', error,
+                    extra=send_failed(error)
+                )
+                return
+            logger.warning('Повтор отправки сообщения: %s', error)
+            ready_at = time.monotonic() + 2 ** message.attempts
+            with self._condition:
+                self._chat_bucket(message.chat_id).block(ready_at)
+                self._push(message, ready_at)
+        except telegram.TelegramError as error:
+            logger.error(
+                'Сообщение в чат не отправлено: %s', error,
+                extra=send_failed(error)
+            )
+
+    def close(self, timeout=None):
+        """Отправляет оставшиеся сообщения и останавливает потоки.
+
+        Через `timeout` секунд отправка прекращается, неотправленные
+        сообщения остаются в очереди и доступны через `pending`.
+        """
+        with self._condition:
+            self._closed = True
+            now = time.monotonic()
+            digests = set(map(id, self._digests.values()))
+            self._delayed = [
+                (now, *item[1:]) if id(item[3]) in digests else item
+                for item in self._delayed
+            ]
+            heapq.heapify(self._delayed)
+            self._condition.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(
+                None if deadline is None
+                else max(0, deadline - time.monotonic())
+            )
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def pending(self):
+        """Неотправленные сообщения: `(chat_id, text, priority)`.
+
+        Сообщения идут в порядке постановки в очередь, отправляемые
+        прямо сейчас тоже считаются неотправленными. Уведомления
+        несобранной сводки возвращаются по одному.
+        """
+        pending = []
+        with self._condition:
+            items = [item[1:] for item in self._delayed] + self._ready
+            for parked in self._parked.values():
+                items.extend(parked)
+            items.extend(
+                (message.priority, -1, message) for message in self._in_flight
+            )
+            for _, _, message in sorted(items, key=lambda item: item[1]):
+                if self._digests.get(message.chat_id) is message:
+                    texts = message.parts
+                else:
+                    texts = [message.text]
+                pending.extend(
+                    (message.chat_id, text, message.priority) for text in texts
+                )
+        return pending
+
+    def save(self, path):
+        """Сохраняет неотправленные сообщения в `path`.
+
+        Если сохранять нечего, файл удаляется, но только прочитанный
+        `load` или записанный этой очередью: чужой файл может принадлежать
+        другой копии бота. Возвращает число сохранённых сообщений.
+        """
+        pending = self.pending()
+        if pending:
+            atomic_write(path, json.dumps(pending, ensure_ascii=False))
+            self._outboxes.add(path)
+        elif path in self._outboxes:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(pending)
+
+    def load(self, path, put=None):
+        """Ставит в очередь сообщения, сохранённые `save` в `path`.
+
+        Сообщения ставятся через `put(chat_id, text, priority)`, по
+        умолчанию прямо в очередь; возвращается число принятых. Файл
+        остаётся на месте до следующего `save`, так что при аварийном
+        завершении сообщения не пропадут, а могут прийти повторно.
+        """
+        try:
+            with open(path, encoding='utf-8') as file:
+                pending = json.load(file)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as error:
+            logger.error(f'Не удалось прочитать очередь {path}: {error}')
+            return 0
+        self._outboxes.add(path)
+        put = put or self.put
+        return sum(
+            bool(put(chat_id, text, priority))
+            for chat_id, text, priority in pending
+        )
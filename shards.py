@@ -0,0 +1,281 @@
+"""Многопроцессный режим: пользователи распределены по рабочим процессам."""
+import asyncio
+import bisect
+import glob
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from functools import partial
+from multiprocessing.connection import wait
+
+import exceptions
+import homework
+from cursor import CursorStore
+from health import HEALTH_FILE, start_watchdog
+from leases import REPLICA_LEASES
+from lifecycle import LIFECYCLE, SHUTDOWN_TIMEOUT
+from logs import LOG_FILE, setup_logging
+from metrics import METRICS_PORT, start_metrics
+from profiling import MEMORY_TRACE_FILE, PROFILE_FILE, start_profiling
+from sender import TELEGRAM_RATE, SendQueue, create_bot
+from storage import StatusStore
+from tenants import TENANT_CURSOR_FLUSH_INTERVAL, load_tenants, run_tenants
+from webhook import WEBHOOK_PORT
+
+SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', 0))
+SHARD_VNODES = int(os.getenv('SHARD_VNODES', 128))
+SHARD_RESTART_MAX = float(os.getenv('SHARD_RESTART_MAX', 60))
+SHARD_STABLE_AFTER = 60
+
+logger = logging.getLogger(__name__)
+
+
+def _hash(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """Кольцо согласованного хеширования.
+
+    Каждый узел занимает `vnodes` точек на кольце, ключ достаётся узлу
+    с ближайшей точкой по часовой стрелке. При добавлении K-го узла
+    к нему переходит примерно 1/K ключей, остальные остаются на месте.
+    """
+
+    def __init__(self, nodes, vnodes=SHARD_VNODES):
+        """Кольцо из узлов `nodes` по `vnodes` точек на узел."""
+        points = sorted(
+            (_hash(f'{node}#{replica}'), node)
+            for node in nodes for replica in range(vnodes)
+        )
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        """Узел, которому принадлежит ключ."""
+        index = bisect.bisect(self._points, _hash(str(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+def shard_tenants(tenants, workers):
+    """Раскладывает пользователей по `workers` шардам."""
+    ring = HashRing(range(workers))
+    shards = [[] for _ in range(workers)]
+    for tenant in tenants:
+        shards[ring.node_for(tenant.name)].append(tenant)
+    return shards
+
+
+def shard_path(path, index):
+    """Путь к файлу шарда рядом с общим файлом `path`."""
+    root, extension = os.path.splitext(path)
+    return f'{root}.shard-{index}{extension}'
+
+
+def shard_port(port, index):
+    """Порт метрик шарда `index`: следующие за портом супервизора.
+
+    Супервизор остаётся на `port`, шард N получает `port + N + 1`;
+    без `port` метрики по HTTP не выдаются и шардами.
+    """
+    return port + index + 1 if port else 0
+
+
+def open_cursors(index, keys):
+    """Курсоры шарда, дополненные курсорами из других файлов.
+
+    После изменения числа процессов пользователь может перейти в другой
+    шард: его курсор берётся из файла прежнего шарда или из общего файла
+    однопроцессного режима.
+    """
+    cursors = CursorStore(
+        shard_path(homework.CURSOR_FILE, index),
+        flush_interval=TENANT_CURSOR_FLUSH_INTERVAL, shared=REPLICA_LEASES
+    )
+    root, extension = os.path.splitext(homework.CURSOR_FILE)
+    paths = glob.glob(f'{glob.escape(root)}.shard-*{extension}')
+    for path in [homework.CURSOR_FILE] + sorted(paths):
+        if os.path.abspath(path) != os.path.abspath(cursors.path):
+            cursors.absorb(path, keys)
+    return cursors
+
+
+def load_shard(path, index, workers):
+    """Пользователи шарда `index` из файла `path`."""
+    return shard_tenants(load_tenants(path), workers)[index]
+
+
+def run_shard(path, index, workers, iterations=None):
+    """Рабочий процесс: опрашивает пользователей своего шарда.
+
+    Лимит Telegram на все чаты делится между процессами поровну;
+    чат принадлежит одному шарду, так что лимит на чат не меняется.
+    По SIGHUP шард перечитывает файл и берёт из него своих
+    пользователей, по SIGTERM плавно останавливается. Сторож пишет
+    состояние шарда в свой файл рядом с `HEALTH_FILE`; неотправленные
+    сообщения, отчёты профилирования — тоже в свои файлы, метрики
+    выдаются на своём порту (`shard_port`).
+    """
+    setup_logging(filename=shard_path(LOG_FILE, index))
+    start_metrics(port=shard_port(METRICS_PORT, index))
+    if HEALTH_FILE:
+        start_watchdog(health_file=shard_path(HEALTH_FILE, index))
+    else:
+        start_watchdog()
+    start_profiling(
+        shard_path(PROFILE_FILE, index), shard_path(MEMORY_TRACE_FILE, index)
+    )
+    LIFECYCLE.install()
+    shard = load_shard(path, index, workers)
+    logger.info(f'Шард {index}: пользователей {len(shard)}')
+    bot = create_bot(homework.TELEGRAM_TOKEN)
+    cursors = open_cursors(index, [tenant.name for tenant in shard])
+    store = StatusStore(homework.STORE_FILE)
+    try:
+        asyncio.run(run_tenants(
+            shard, bot, cursors=cursors, store=store,
+            queue=SendQueue(bot, rate=TELEGRAM_RATE / workers),
+            iterations=iterations, lifecycle=LIFECYCLE,
+            load=partial(load_shard, path, index, workers),
+            outbox=shard_path(homework.OUTBOX_FILE, index)
+        ))
+    finally:
+        store.close()
+
+
+class Supervisor:
+    """Запускает процессы шардов и перезапускает упавшие.
+
+    Процесс, завершившийся с ненулевым кодом, перезапускается через
+    1, 2, 4... секунды, но не реже `restart_max`; остальные шарды
+    при этом продолжают работу. Счётчик перезапусков сбрасывается,
+    если процесс проработал дольше `SHARD_STABLE_AFTER` секунд.
+    При ограниченном `iterations` упавшие процессы не перезапускаются.
+
+    С `lifecycle` SIGHUP пересылается всем процессам, а SIGTERM
+    останавливает их и ждёт завершения не дольше `SHUTDOWN_TIMEOUT`.
+    """
+
+    def __init__(self, path, workers, iterations=None, target=run_shard,
+                 context=None, restart_max=SHARD_RESTART_MAX,
+                 lifecycle=None):
+        """Супервизор `workers` процессов для файла пользователей `path`."""
+        self.path = path
+        self.workers = workers
+        self.iterations = iterations
+        self.target = target
+        self.context = context or multiprocessing.get_context('spawn')
+        self.restart_max = restart_max
+        self.processes = {}
+        self.restarts = [0] * workers
+        self.started_at = [0.0] * workers
+        self.restart_at = {}
+        self.lifecycle = lifecycle
+
+    def start(self, index):
+        """Запускает процесс шарда `index`."""
+        process = self.context.Process(
+            target=self.target,
+            args=(self.path, index, self.workers, self.iterations),
+            name=f'shard-{index}',
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+
+    def reap(self, index):
+        """Обрабатывает завершение процесса шарда `index`."""
+        process = self.processes.pop(index)
+        process.join()
+        if process.exitcode == 0 or self.iterations is not None:
+            logger.info(
+                f'Шард {index} завершил работу с кодом {process.exitcode}'
+            )
+            return
+        if time.monotonic() - self.started_at[index] >= SHARD_STABLE_AFTER:
+            self.restarts[index] = 0
+        delay = min(self.restart_max, 2 ** self.restarts[index])
+        self.restarts[index] += 1
+        logger.error(
+            f'Шард {index} завершился с кодом {process.exitcode}, '
+            f'перезапуск через {delay} с'
+        )
+        self.restart_at[index] = time.monotonic() + delay
+
+    def run(self):
+        """Работает, пока живы процессы или ждут перезапуска."""
+        for index in range(self.workers):
+            self.start(index)
+        try:
+            while self.processes or self.restart_at:
+                timeout = self.restart_due()
+                sentinels = {
+                    process.sentinel: index
+                    for index, process in self.processes.items()
+                }
+                for sentinel in self.wait(list(sentinels), timeout):
+                    self.reap(sentinels[sentinel])
+                if self.lifecycle is None:
+                    continue
+                if self.lifecycle.stopping:
+                    return
+                if self.lifecycle.take_reload():
+                    self.signal(signal.SIGHUP)
+        finally:
+            self.stop()
+
+    def restart_due(self):
+        """Перезапускает дождавшиеся процессы; время до следующего."""
+        now = time.monotonic()
+        for index, due in list(self.restart_at.items()):
+            if due <= now:
+                del self.restart_at[index]
+                self.start(index)
+        if not self.restart_at:
+            return None
+        return max(0, min(self.restart_at.values()) - now)
+
+    def wait(self, sentinels, timeout):
+        """Ждёт завершения процессов; сигнал прерывает ожидание."""
+        if self.lifecycle is None:
+            return wait(sentinels, timeout)
+        if not self.lifecycle.idle:
+            return []
+        with self.lifecycle.interruptible():
+            return wait(sentinels, timeout)
+        return []
+
+    def signal(self, signum):
+        """Отправляет сигнал всем процессам шардов."""
+        for process in self.processes.values():
+            if process.pid is not None:
+                os.kill(process.pid, signum)
+
+    def stop(self, timeout=SHUTDOWN_TIMEOUT):
+        """Останавливает процессы шардов, ждёт их не дольше `timeout`."""
+        deadline = time.monotonic() + timeout
+        for process in self.processes.values():
+            process.terminate()
+        for index, process in self.processes.items():
+            process.join(max(0, deadline - time.monotonic()))
+            if process.exitcode is None:
+                logger.error(f'Шард {index} не остановился, завершение')
+                process.kill()
+                process.join()
+        self.processes.clear()
+
+
+def main(path, workers=SHARD_WORKERS, iterations=None, lifecycle=None):
+    """Запуск бота в многопроцессном режиме."""
+    if not homework.TELEGRAM_TOKEN:
+        logger.critical('TELEGRAM_TOKEN отсутствует')
+        raise exceptions.TokenError('Tokens Error')
+    if WEBHOOK_PORT:
+        logger.warning('Приём webhook в многопроцессном режиме не работает')
+    logger.info(f'Запуск процессов шардов: {workers}')
+    Supervisor(path, workers, iterations, lifecycle=lifecycle).run()
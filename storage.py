@@ -0,0 +1,206 @@
+"""Хранилище последних отправленных статусов домашних работ."""
+import sqlite3
+import threading
+
+LOOKUP_CHUNK = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS statuses (
+    tenant TEXT NOT NULL,
+    homework_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    date_updated TEXT,
+    PRIMARY KEY (tenant, homework_id)
+) WITHOUT ROWID
+'''
+
+
+def homework_key(homework):
+    """Ключ домашней работы: `id`, а если его нет — название."""
+    homework_id = homework.get('id')
+    if homework_id is None:
+        homework_id = homework.get('homework_name')
+    return str(homework_id)
+
+
+class HomeworkRecord:
+    """Компактная запись о статусе домашней работы."""
+
+    __slots__ = ('id', 'name', 'status', 'date_updated')
+
+    def __init__(self, homework_id, name, status, date_updated=None):
+        """Запись о статусе работы."""
+        self.id = homework_id
+        self.name = name
+        self.status = status
+        self.date_updated = date_updated
+
+    @classmethod
+    def from_dict(cls, homework):
+        """Запись из элемента списка `homeworks` ответа API."""
+        return cls(
+            homework_key(homework),
+            homework.get('homework_name'),
+            homework.get('status'),
+            homework.get('date_updated'),
+        )
+
+    def __repr__(self):
+        """Запись в виде для отладки."""
+        return f'HomeworkRecord({self.id!r}, {self.status!r})'
+
+
+def diff_homeworks(homeworks, known):
+    """Изменившиеся домашние работы в порядке `date_updated`.
+
+    `known` — словарь ключ работы -> `(status, date_updated)`
+    с последними отправленными статусами. Если работа встречается
+    в списке несколько раз, остаётся самая свежая запись. API отдаёт
+    работы отсортированными, а на упорядоченных данных `sorted`
+    работает за линейное время.
+    """
+    latest = {}
+    for homework in homeworks:
+        key = homework_key(homework)
+        current = latest.get(key)
+        if current is None or _updated(current) <= _updated(homework):
+            latest[key] = homework
+    changed = [
+        homework for key, homework in latest.items()
+        if known.get(key) != (
+            homework.get('status'), homework.get('date_updated')
+        )
+    ]
+    return sorted(changed, key=_updated)
+
+
+def _updated(homework):
+    return homework.get('date_updated') or ''
+
+
+class MemoryStatusStore:
+    """Последние отправленные статусы в памяти процесса."""
+
+    def __init__(self):
+        """Пустое хранилище."""
+        self._statuses = {}
+
+    def lookup(self, tenant, keys):
+        """Возвращает известные статусы работ по их ключам."""
+        statuses = self._statuses.get(str(tenant), {})
+        return {key: statuses[key] for key in keys if key in statuses}
+
+    def changed(self, tenant, homeworks):
+        """Изменившиеся домашние работы в порядке `date_updated`."""
+        return diff_homeworks(
+            homeworks,
+            self.lookup(tenant, [homework_key(hw) for hw in homeworks]),
+        )
+
+    def remember(self, tenant, homework):
+        """Запоминает статус домашней работы как отправленный."""
+        self._statuses.setdefault(str(tenant), {})[homework_key(homework)] = (
+            homework.get('status'), homework.get('date_updated')
+        )
+
+    def remember_records(self, tenant, records):
+        """Запоминает статусы из пачки записей `HomeworkRecord`."""
+        statuses = self._statuses.setdefault(str(tenant), {})
+        for record in records:
+            statuses[record.id] = (record.status, record.date_updated)
+
+    def close(self):
+        """Хранилище в памяти закрывать не нужно."""
+
+
+class StatusStore(MemoryStatusStore):
+    """Последние отправленные статусы в SQLite.
+
+    Статусы ищутся по первичному ключу (пользователь, домашняя работа),
+    поэтому при запуске таблица не читается целиком и холодный старт
+    не зависит от числа сохранённых работ. Соединение общее для всех
+    потоков и защищено блокировкой.
+    """
+
+    def __init__(self, path):
+        """Открывает или создаёт базу статусов `path`."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(SCHEMA)
+
+    def get(self, tenant, homework_id):
+        """Возвращает `(status, date_updated)` или None."""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT status, date_updated FROM statuses '
+                'WHERE tenant = ? AND homework_id = ?',
+                (str(tenant), str(homework_id)),
+            ).fetchone()
+
+    def set(self, tenant, homework_id, status, date_updated=None):
+        """Сохраняет отправленный статус домашней работы."""
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO statuses '
+                '(tenant, homework_id, status, date_updated) '
+                'VALUES (?, ?, ?, ?)',
+                (str(tenant), str(homework_id), status, date_updated),
+            )
+
+    def lookup(self, tenant, keys):
+        """Возвращает известные статусы работ одним запросом на пачку."""
+        keys = list(dict.fromkeys(keys))
+        known = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                rows = self._connection.execute(
+                    'SELECT homework_id, status, date_updated FROM statuses '
+                    'WHERE tenant = ? AND homework_id IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    (str(tenant), *chunk),
+                )
+                for homework_id, status, date_updated in rows:
+                    known[homework_id] = (status, date_updated)
+        return known
+
+    def remember(self, tenant, homework):
+        """Запоминает статус домашней работы как отправленный."""
+        self.set(
+            tenant,
+            homework_key(homework),
+            homework.get('status'),
+            homework.get('date_updated'),
+        )
+
+    def remember_records(self, tenant, records):
+        """Запоминает статусы из пачки записей одной транзакцией."""
+        tenant = str(tenant)
+        with self._lock:
+            self._connection.execute('BEGIN')
+            try:
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO statuses '
+                    '(tenant, homework_id, status, date_updated) '
+                    'VALUES (?, ?, ?, ?)',
+                    (
+                        (tenant, record.id, record.status,
+                         record.date_updated)
+                        for record in records
+                    ),
+                )
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def close(self):
+        """Закрывает соединение с базой."""
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,405 @@
+"""Многопользовательский режим: опрос многих токенов в одном процессе."""
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import exceptions
+import homework
+from client import PracticumClient
+from cursor import CursorStore
+from leases import REPLICA_LEASES, LeaseKeeper, LeaseTable, replica_path
+from lifecycle import SHUTDOWN_TIMEOUT
+from scheduler import create_scheduler
+from sender import ERROR_PRIORITY, SendQueue, create_bot
+from webhook import (WEBHOOK_PORT, WEBHOOK_RECONCILE_PERIOD, WebhookReceiver,
+                     serve_webhook)
+from storage import StatusStore
+
+TENANT_WORKERS = int(os.getenv('TENANT_WORKERS', 32))
+TENANT_CURSOR_FLUSH_INTERVAL = float(
+    os.getenv('TENANT_CURSOR_FLUSH_INTERVAL', 10)
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Tenant:
+    """Настройки одного пользователя: токен Практикума и чат Telegram."""
+
+    __slots__ = ('name', 'chat_id', 'headers')
+
+    def __init__(self, practicum_token, chat_id, name=None):
+        """Пользователь с токеном Практикума и чатом Telegram."""
+        self.name = name or str(chat_id)
+        self.chat_id = chat_id
+        self.headers = {'Authorization': f'OAuth {practicum_token}'}
+
+    def __repr__(self):
+        """Пользователь в виде для отладки."""
+        return f'Tenant({self.name!r})'
+
+
+def load_tenants(path):
+    """Загружает список пользователей из JSON-файла.
+
+    Имя пользователя — ключ его курсора и статусов, поэтому имена должны
+    быть уникальны; по умолчанию имя — номер чата.
+    """
+    try:
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+    except (OSError, ValueError) as error:
+        raise exceptions.TenantConfigError(
+            f'Не удалось прочитать {path}: {error}'
+        )
+    if not isinstance(data, list):
+        raise exceptions.TenantConfigError(
+            'Файл пользователей должен содержать список'
+        )
+    tenants = []
+    names = set()
+    for number, item in enumerate(data):
+        if not isinstance(item, dict):
+            raise exceptions.TenantConfigError(
+                f'Пользователь #{number} должен быть словарём'
+            )
+        for key in ('practicum_token', 'chat_id'):
+            if not item.get(key):
+                raise exceptions.TenantConfigError(
+                    f'У пользователя #{number} нет ключа "{key}"'
+                )
+        tenant = Tenant(
+            item['practicum_token'], item['chat_id'], item.get('name')
+        )
+        if tenant.name in names:
+            raise exceptions.TenantConfigError(
+                f'Имя пользователя #{number} "{tenant.name}" уже занято: '
+                f'задайте разные "name"'
+            )
+        names.add(tenant.name)
+        tenants.append(tenant)
+    return tenants
+
+
+async def poll_loop(state, poll, scheduler, sleep=asyncio.sleep, delay=0,
+                    iterations=None):
+    """Цикл опроса: итерация `poll` и пауза, заданная планировщиком.
+
+    Пауза — корутина `sleep`: `replay` прогоняет этот же цикл
+    на виртуальных часах.
+    """
+    await sleep(delay)
+    while iterations is None or iterations > 0:
+        await poll()
+        if iterations is not None:
+            iterations -= 1
+            if not iterations:
+                break
+        await sleep(scheduler.next_delay(state))
+    return state
+
+
+async def poll_tenant(tenant, state, queue, executor, client, scheduler,
+                      delay=0, iterations=None, sleep=asyncio.sleep):
+    """Цикл опроса API для одного пользователя.
+
+    Блокирующая итерация выполняется в общем пуле потоков, а ожидание
+    между итерациями не занимает ни потока, ни процессора. Токен и чат
+    берутся из `tenant` на каждой итерации, поэтому перезагрузка
+    настроек подхватывается без перезапуска цикла.
+    """
+    loop = asyncio.get_running_loop()
+
+    def fetch(timestamp):
+        return homework.request_homeworks(
+            tenant.headers, timestamp, client=client, cache=state.cache
+        )
+
+    def send_error(message):
+        return queue.put(tenant.chat_id, message, priority=ERROR_PRIORITY)
+
+    def poll():
+        return loop.run_in_executor(
+            executor, homework.poll_once, state, fetch,
+            partial(send_status, queue, tenant), send_error
+        )
+
+    return await poll_loop(state, poll, scheduler, sleep, delay, iterations)
+
+
+def send_status(queue, tenant, message):
+    """Ставит уведомление о статусе в очередь чата пользователя."""
+    return queue.put(tenant.chat_id, message)
+
+
+class TenantRunner:
+    """Опрос многих пользователей на одном цикле событий.
+
+    Первые запросы равномерно распределены по `RETRY_PERIOD`,
+    чтобы не отправлять тысячи запросов к API одновременно.
+    Все пользователи делят очередь отправки сообщений `queue`, пул
+    соединений размером `workers`, хранилище курсоров `cursors`
+    и хранилище статусов `store`. С приёмом webhook (`receiver`) опрос
+    остаётся редкой сверкой раз в `WEBHOOK_RECONCILE_PERIOD`.
+
+    С `lifecycle` запрос на перезагрузку заново читает список
+    пользователей через `load`: новые начинают опрашиваться, удалённые
+    перестают, у оставшихся меняются токен и чат, а курсоры, кеш
+    ответов и известные статусы сохраняются. Запрос на остановку
+    прекращает опрос, дожидается отправки очереди не дольше
+    `SHUTDOWN_TIMEOUT` секунд, сохраняет курсоры и закрывает соединения.
+    Статус считается отправленным, как только сообщение встало
+    в очередь, поэтому с `outbox` неотправленные к остановке сообщения
+    сохраняются в этот файл и уходят после перезапуска.
+
+    При `REPLICA_LEASES` пользователей делят копии бота с общим
+    `STATE_DIR`: каждый опрашивается только держателем аренды. Очередь
+    каждая копия сохраняет в свой файл рядом с `outbox`, а после
+    перезапуска отправляет из него только сообщения пользователей,
+    аренду которых держит.
+    """
+
+    def __init__(self, bot, workers=TENANT_WORKERS, cursors=None,
+                 store=None, queue=None, receiver=None, iterations=None,
+                 lifecycle=None, load=None, outbox=None, clock=time.monotonic,
+                 sleep=asyncio.sleep):
+        """Общие ресурсы пользователей; опрос начинает `run`.
+
+        `clock` — часы планировщика и состояний пользователей, `sleep` —
+        корутина паузы между итерациями.
+        """
+        self.bot = bot
+        self.workers = workers
+        self.cursors = cursors
+        self.store = store
+        self.queue = queue
+        self.receiver = receiver
+        self.iterations = iterations
+        self.lifecycle = lifecycle
+        self.load = load
+        self.outbox = outbox
+        self.clock = clock
+        self.sleep = sleep
+        self.tenants = {}
+        self.states = {}
+        self.tasks = {}
+        self.leases = None
+
+    async def run(self, tenants):
+        """Опрашивает пользователей до конца итераций или остановки."""
+        if not tenants and self.lifecycle is None:
+            return []
+        loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.client = PracticumClient(
+            homework.ENDPOINT, pool_size=self.workers
+        )
+        self.scheduler = create_scheduler(
+            homework.RETRY_PERIOD if self.receiver is None
+            else WEBHOOK_RECONCILE_PERIOD, clock=self.clock
+        )
+        if self.queue is None:
+            self.queue = SendQueue(self.bot)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        if self.lifecycle is not None:
+            self.lifecycle.listeners.append(
+                partial(loop.call_soon_threadsafe, self.wakeup.set)
+            )
+        if REPLICA_LEASES:
+            self.leases = LeaseKeeper(
+                LeaseTable(homework.STORE_FILE), self.tenants.keys()
+            )
+            if self.outbox is not None:
+                self.outbox = replica_path(
+                    self.outbox, self.leases.table.owner
+                )
+        step = 0
+        if tenants and self.iterations is None:
+            step = homework.RETRY_PERIOD / len(tenants)
+        for number, tenant in enumerate(tenants):
+            self.start(tenant, number * step)
+        if self.leases is not None:
+            self.leases.start()
+        self.restore()
+        try:
+            await self.supervise()
+            return [
+                self.states[tenant.name] for tenant in tenants
+                if tenant.name in self.states
+            ]
+        finally:
+            await self.shutdown()
+
+    def restore(self):
+        """Возвращает в очередь сообщения, сохранённые при остановке."""
+        if self.outbox is None:
+            return
+        restored = self.queue.load(self.outbox, self.put_restored)
+        if restored:
+            logger.info(f'Из {self.outbox} восстановлено сообщений: '
+                        f'{restored}')
+
+    def put_restored(self, chat_id, text, priority):
+        """Ставит сохранённое сообщение, если его пользователь наш.
+
+        Без аренды в очередь встаёт всё; с арендой сообщение уходит через
+        ограду аренды пользователя с этим чатом.
+        """
+        put = partial(self.queue.put, chat_id, priority=priority)
+        if self.leases is None:
+            return put(text)
+        for name, tenant in self.tenants.items():
+            if tenant.chat_id == chat_id:
+                return self.leases.fence(name, put)(text)
+        return False
+
+    def start(self, tenant, delay=0):
+        """Запускает цикл опроса пользователя."""
+        state = self.states.get(tenant.name)
+        if state is None:
+            state = self.states[tenant.name] = homework.TenantState(
+                int(time.time()), self.cursors, tenant.name, self.store,
+                clock=self.clock, leases=self.leases
+            )
+        self.tenants[tenant.name] = tenant
+        if self.receiver is not None:
+            self.receiver.subscribe(
+                tenant.name, state,
+                state.fence(partial(send_status, self.queue, tenant))
+            )
+        self.tasks[tenant.name] = asyncio.ensure_future(poll_tenant(
+            tenant, state, self.queue, self.executor, self.client,
+            self.scheduler, delay, self.iterations, self.sleep
+        ))
+
+    async def supervise(self):
+        """Ждёт завершения циклов опроса, сигналов остановки и перезагрузки."""
+        while self.tasks or (
+                self.lifecycle is not None and self.iterations is None):
+            waiter = asyncio.ensure_future(self.wakeup.wait())
+            await asyncio.wait(
+                {waiter, *self.tasks.values()},
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            waiter.cancel()
+            self.wakeup.clear()
+            for name, task in list(self.tasks.items()):
+                if task.done():
+                    del self.tasks[name]
+                    task.result()
+            if self.lifecycle is None:
+                continue
+            if self.lifecycle.stopping:
+                return
+            if self.lifecycle.take_reload():
+                self.reload()
+
+    def reload(self):
+        """Перечитывает настройки и список пользователей."""
+        homework.reload_settings()
+        if self.receiver is None:
+            self.scheduler.period = homework.RETRY_PERIOD
+        try:
+            tenants = self.load() if self.load is not None else None
+        except exceptions.TenantConfigError as error:
+            logger.error(f'Список пользователей не обновлён: {error}')
+            return
+        if tenants is not None:
+            self.update(tenants)
+
+    def update(self, tenants):
+        """Приводит опрашиваемых пользователей к списку `tenants`."""
+        fresh = {tenant.name: tenant for tenant in tenants}
+        for name in set(self.tenants) - set(fresh):
+            del self.tenants[name]
+            del self.states[name]
+            task = self.tasks.pop(name, None)
+            if task is not None:
+                task.cancel()
+            if self.receiver is not None:
+                self.receiver.subscribers.pop(name, None)
+        added = 0
+        for name, tenant in fresh.items():
+            current = self.tenants.get(name)
+            if current is None:
+                self.start(tenant)
+                added += 1
+            else:
+                current.chat_id = tenant.chat_id
+                current.headers = tenant.headers
+        logger.info(
+            f'Список пользователей обновлён: {len(fresh)}, новых {added}'
+        )
+
+    async def shutdown(self):
+        """Останавливает опрос, отправляет очередь и сохраняет курсоры."""
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.leases is not None:
+            self.leases.stop()
+        stopping = self.lifecycle is not None and self.lifecycle.stopping
+        self.queue.close(
+            timeout=max(0, deadline - time.monotonic()) if stopping else None
+        )
+        if self.outbox is not None:
+            saved = self.queue.save(self.outbox)
+            if saved:
+                logger.warning(f'Не отправлено сообщений: {saved}, они '
+                               f'сохранены в {self.outbox}')
+        elif len(self.queue):
+            logger.warning(f'Не отправлено сообщений: {len(self.queue)}')
+        self.client.close()
+        if self.cursors is not None:
+            self.cursors.flush()
+
+
+async def run_tenants(tenants, bot, workers=TENANT_WORKERS, cursors=None,
+                      store=None, queue=None, receiver=None,
+                      iterations=None, lifecycle=None, load=None,
+                      outbox=None, clock=time.monotonic, sleep=asyncio.sleep):
+    """Опрашивает всех пользователей на одном цикле событий."""
+    return await TenantRunner(
+        bot, workers, cursors, store, queue, receiver, iterations,
+        lifecycle, load, outbox, clock, sleep
+    ).run(tenants)
+
+
+def main(path, iterations=None, lifecycle=None):
+    """Запуск бота в многопользовательском режиме.
+
+    `iterations` ограничивает число опросов каждого пользователя,
+    например одним при запуске с `--once`. С `lifecycle` список
+    пользователей перечитывается по SIGHUP.
+    """
+    if not homework.TELEGRAM_TOKEN:
+        logger.critical('TELEGRAM_TOKEN отсутствует')
+        raise exceptions.TokenError('Tokens Error')
+    tenants = load_tenants(path)
+    logger.info(f'Загружено пользователей: {len(tenants)}')
+    bot = create_bot(homework.TELEGRAM_TOKEN)
+    cursors = CursorStore(
+        homework.CURSOR_FILE, flush_interval=TENANT_CURSOR_FLUSH_INTERVAL,
+        shared=REPLICA_LEASES
+    )
+    store = StatusStore(homework.STORE_FILE)
+    receiver = None
+    if WEBHOOK_PORT and iterations is None:
+        receiver = WebhookReceiver(homework.handle_response)
+        if serve_webhook(receiver) is None:
+            receiver = None
+    try:
+        asyncio.run(run_tenants(
+            tenants, bot, cursors=cursors, store=store, receiver=receiver,
+            iterations=iterations, lifecycle=lifecycle,
+            load=partial(load_tenants, path), outbox=homework.OUTBOX_FILE
+        ))
+    finally:
+        store.close()
@@ -1,5 +1,6 @@
 import sys
 import os
+import tempfile
 
 
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -26,3 +27,6 @@ os.environ['PRACTICUM_TOKEN'] = 'sometoken'
 os.environ['TELEGRAM_TOKEN'] = '1234:abcdefg'
 os.environ['TELEGRAM_CHAT_ID'] = '12345'
 
+os.environ['STATE_DIR'] = tempfile.mkdtemp()
+# Тесты подменяют `requests.get`, поэтому клиент API в них без пула.
+os.environ['API_POOL_SIZE'] = '0'
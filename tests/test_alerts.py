@@ -0,0 +1,116 @@
+import requests
+
+import homework
+from alerts import ErrorReporter, fingerprint
+from utils import FakeClock
+
+
+def wrapped(error):
+    try:
+        try:
+            raise error
+        except Exception:
+            raise Exception('Эндпоинт не найден')
+    except Exception as wrapper:
+        return wrapper
+
+
+class TestErrorReporter:
+
+    def test_fingerprint_ignores_text_and_wrappers(self):
+        first = wrapped(requests.exceptions.ConnectionError('host 1'))
+        second = wrapped(requests.exceptions.ConnectionError('host 2'))
+        assert fingerprint(first, 'get_api_answer') == (
+            'get_api_answer', 'ConnectionError'
+        )
+        assert fingerprint(first, 'x') == fingerprint(second, 'x')
+        assert fingerprint(KeyError('a'), 'x') != fingerprint(
+            TypeError('a'), 'x'
+        )
+
+    def test_repeats_are_suppressed_and_digested(self):
+        clock = FakeClock()
+        reporter = ErrorReporter(3600, clock=clock)
+        assert reporter.report(Exception('API error: 1'), 'fetch') == (
+            'Сбой в работе программы: API error: 1'
+        )
+        assert reporter.report(KeyError('status'), 'handle') is not None
+        for number in range(5):
+            clock.now += 60
+            assert reporter.report(Exception(f'API error: {number}'),
+                                   'fetch') is None
+            assert reporter.report(KeyError('status'), 'handle') is None
+        sent = []
+
+        def send(message):
+            sent.append(message)
+            return True
+
+        assert reporter.flush(send) == []
+        clock.now = 3600
+        digests = reporter.flush(send)
+        assert len(digests) == 2
+        assert digests == sent
+        assert 'повторилась 5 раз за последний час' in digests[0]
+        assert 'Последняя: API error: 4' in digests[0]
+        clock.now = 7200
+        assert reporter.flush(send) == []
+        assert reporter.report(Exception('API error'), 'fetch') == (
+            'Сбой в работе программы: API error'
+        )
+
+    def test_poll_once_sends_one_message_per_fingerprint(self):
+        sent = []
+        state = homework.TenantState(0)
+
+        def fetch(timestamp):
+            raise Exception(f'API error: {len(sent)} {timestamp}')
+
+        for _ in range(10):
+            homework.poll_once(
+                state, fetch, lambda message: sent.append(message) or True
+            )
+        assert len(sent) == 1
+        assert state.failures == 10
+
+    def test_failed_report_is_retried(self):
+        attempts = []
+        state = homework.TenantState(0)
+
+        def fetch(timestamp):
+            raise Exception('API error')
+
+        def send(message):
+            attempts.append(message)
+            return len(attempts) > 2
+
+        for _ in range(5):
+            homework.poll_once(state, fetch, send)
+        assert len(attempts) == 3
+
+    def test_failed_digest_is_kept(self):
+        clock = FakeClock()
+        state = homework.TenantState(0)
+        state.errors = ErrorReporter(window=3600, clock=clock)
+        attempts = []
+
+        def fetch(timestamp):
+            raise Exception('API error')
+
+        def send(message):
+            attempts.append(message)
+            return len(attempts) != 2
+
+        homework.poll_once(state, fetch, send)
+        clock.now = 60
+        homework.poll_once(state, fetch, send)
+        clock.now = 3600
+        homework.poll_once(state, fetch, send)
+        assert len(attempts) == 2
+        assert 'повторилась 2 раз' in attempts[1]
+        clock.now = 3660
+        homework.poll_once(state, fetch, send)
+        assert len(attempts) == 3
+        assert 'повторилась 3 раз' in attempts[2]
+        homework.poll_once(state, fetch, send)
+        assert len(attempts) == 3
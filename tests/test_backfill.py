@@ -0,0 +1,127 @@
+import json
+import tracemalloc
+
+import pytest
+
+import exceptions
+from backfill import HomeworksStream, backfill
+from storage import StatusStore
+
+
+def history(size):
+    return {
+        'current_date': 1700000000,
+        'homeworks': [
+            {
+                'id': number,
+                'homework_name': f'работа_{number}.zip',
+                'status': 'approved',
+                'date_updated': '2020-02-13T14:40:57Z',
+                'reviewer_comment': 'Отлично',
+            }
+            for number in range(size)
+        ],
+        'note': None,
+    }
+
+
+def chunked(data, size):
+    return (data[start:start + size] for start in range(0, len(data), size))
+
+
+def streamed_history(size):
+    yield b'{"homeworks": ['
+    for number in range(size):
+        if number:
+            yield b', '
+        yield json.dumps({
+            'id': number,
+            'homework_name': f'hw_{number}.zip',
+            'status': 'reviewing',
+            'date_updated': '2020-02-13T14:40:57Z',
+        }).encode()
+    yield b'], "current_date": 1700000000}'
+
+
+class FakeStreamResponse:
+
+    def __init__(self, chunks, status_code=200):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return self.chunks
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, headers, params, stream=False):
+        assert params == {'from_date': 0} and stream
+        return self.response
+
+
+class TestHomeworksStream:
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+    def test_stream_matches_json(self, chunk_size):
+        data = history(20)
+        stream = HomeworksStream(
+            chunked(json.dumps(data, ensure_ascii=False).encode(), chunk_size)
+        )
+        assert list(stream) == data['homeworks']
+        assert stream.fields == {'current_date': 1700000000, 'note': None}
+        assert stream.has_homeworks
+
+    @pytest.mark.parametrize('body', [
+        b'{"homeworks": [{"id": 1}', b'[]', b'{"homeworks": [1 2]}',
+    ])
+    def test_invalid_body(self, body):
+        with pytest.raises(exceptions.WrongDataFormat):
+            list(HomeworksStream(chunked(body, 3)))
+
+    def test_memory_does_not_grow_with_history(self):
+        peaks = []
+        for size in (1000, 20000):
+            tracemalloc.start()
+            for _ in HomeworksStream(streamed_history(size)):
+                pass
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        assert peaks[1] < peaks[0] * 2
+
+
+class TestBackfill:
+
+    def test_backfill_writes_batches(self, tmp_path):
+        store = StatusStore(tmp_path / 'homework.db')
+        batches = []
+        remember_records = store.remember_records
+
+        def spy(tenant, records):
+            batches.append(len(records))
+            remember_records(tenant, records)
+
+        store.remember_records = spy
+        response = FakeStreamResponse(streamed_history(25))
+        count, current_date = backfill(
+            {}, 'default', store, FakeClient(response), batch_size=10
+        )
+        assert (count, current_date) == (25, 1700000000)
+        assert batches == [10, 10, 5]
+        assert store.get('default', 24) == (
+            'reviewing', '2020-02-13T14:40:57Z'
+        )
+        assert response.closed
+
+    def test_backfill_without_homeworks(self, tmp_path):
+        store = StatusStore(tmp_path / 'homework.db')
+        response = FakeStreamResponse([b'{"current_date": 1}'])
+        with pytest.raises(exceptions.HomeworksKeyError):
+            backfill({}, 'default', store, FakeClient(response))
@@ -0,0 +1,77 @@
+import pytest
+import requests
+
+import exceptions
+import homework
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from client import PracticumClient
+from utils import FakeClock, FakeResponse
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_failures_and_probes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker('endpoint', 3, 60, clock=clock)
+        for _ in range(3):
+            breaker.allow()
+            breaker.failure()
+        assert breaker.state == OPEN
+        with pytest.raises(exceptions.CircuitOpenError):
+            breaker.allow()
+        clock.now = 60
+        breaker.allow()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(exceptions.CircuitOpenError):
+            breaker.allow()
+        breaker.failure()
+        assert breaker.state == OPEN
+        clock.now = 120
+        breaker.allow()
+        breaker.success()
+        assert breaker.state == CLOSED
+        breaker.allow()
+
+    def test_disabled_breaker_never_opens(self):
+        breaker = CircuitBreaker('endpoint', 0)
+        for _ in range(100):
+            breaker.failure()
+        breaker.allow()
+
+
+class TestClientBreakers:
+
+    def test_endpoint_outage_stops_all_tokens(self, monkeypatch):
+        calls = []
+
+        def get(**kwargs):
+            calls.append(kwargs)
+            raise requests.exceptions.ConnectionError('down')
+
+        monkeypatch.setattr(requests, 'get', get)
+        client = PracticumClient('https://example.com/')
+        for number in range(10):
+            with pytest.raises(Exception):
+                client.get({'Authorization': f'OAuth {number}'}, {})
+        assert len(calls) == client.breaker.failures
+        with pytest.raises(exceptions.CircuitOpenError):
+            homework.request_homeworks(
+                {'Authorization': 'OAuth other'}, 0, client=client
+            )
+
+    def test_bad_token_opens_only_its_breaker(self, monkeypatch):
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda **kwargs: FakeResponse(
+                status_code=401 if kwargs['headers']['Authorization'] == 'OAuth bad'
+                else 200
+            )
+        )
+        client = PracticumClient('https://example.com/')
+        bad = {'Authorization': 'OAuth bad'}
+        for _ in range(client.breaker.failures):
+            client.get(bad, {})
+        with pytest.raises(exceptions.CircuitOpenError):
+            client.get(bad, {})
+        assert client.get({'Authorization': 'OAuth good'}, {}).status_code == 200
+        assert client.breaker.state == CLOSED
@@ -0,0 +1,69 @@
+import homework
+import replay
+from cassette import RECORDER, VirtualClock, load_cassette
+from scheduler import AdaptiveScheduler
+
+STATUSES = ('reviewing', 'approved')
+
+
+def api(poll):
+    if poll == 2:
+        raise Exception('Эндпоинт не найден')
+    return {
+        'homeworks': [{
+            'homework_name': 'hw',
+            'status': STATUSES[poll % 2],
+            'date_updated': str(poll),
+        }],
+        'current_date': poll + 1,
+    }
+
+
+def record(path, polls=5):
+    RECORDER.start(path)
+    try:
+        state = homework.TenantState(0)
+        sent = []
+        for poll in range(polls):
+            homework.poll_once(
+                state, lambda timestamp: api(poll),
+                lambda message: sent.append(message) or True
+            )
+    finally:
+        RECORDER.stop()
+    return sent
+
+
+class TestCassette:
+
+    def test_record_and_replay_exactly(self, tmp_path):
+        path = tmp_path / 'cassette.jsonl'
+        sent = record(path)
+        cassette = load_cassette(path)
+        assert len(cassette['default']) == 5
+        assert cassette['default'][2].error
+        report = replay.replay(cassette, period=600)
+        assert report.polls == 5
+        assert report.failures == 1
+        assert report.messages == len(sent)
+        assert not report.mismatches
+        assert report.virtual_seconds == 4 * 600
+
+    def test_week_of_many_tenants(self, tmp_path):
+        path = tmp_path / 'cassette.jsonl'
+        record(path)
+        report = replay.replay(load_cassette(path), copies=50, period=600)
+        assert report.polls == 50 * 7 * 144
+        assert report.wall_seconds < 30
+        assert report.messages > report.polls / 2
+
+    def test_virtual_clock_drives_scheduler(self):
+        clock = VirtualClock(start=1000)
+        scheduler = AdaptiveScheduler(
+            600, floor=60, idle_after=3600, idle_max=3000, clock=clock
+        )
+        state = homework.TenantState(0, clock=clock)
+        assert scheduler.next_delay(state) == 600
+        clock.sleep(2 * 3600)
+        assert clock.time() == 1000 + 7200
+        assert scheduler.next_delay(state) == 1800
@@ -0,0 +1,111 @@
+import json
+
+import requests
+
+import homework
+from client import PracticumClient, ResponseCache
+from metrics import METRICS
+from utils import FakeResponse
+
+
+class TestPracticumClient:
+
+    def test_without_pool_uses_requests_get(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(
+            requests, 'get',
+            lambda **kwargs: calls.append(kwargs) or FakeResponse(b'{}')
+        )
+        client = PracticumClient(
+            'https://example.com/', pool_size=0, timeout=5
+        )
+        client.get({'Authorization': 'OAuth token'}, {'from_date': 0})
+        assert calls[0]['timeout'] == 5
+        assert client._session is None
+
+    def test_pooled_session_is_reused(self):
+        client = PracticumClient('https://example.com/', pool_size=4)
+        session = client.session
+        adapter = session.get_adapter('https://example.com/')
+        assert client.session is session
+        assert adapter._pool_maxsize == 4
+        client.close()
+        assert client._session is None
+
+
+class TestResponseCache:
+    BODY = b'{"homeworks": [], "current_date": %d}'
+
+    def test_identical_body_is_skipped_after_commit(self):
+        cache = ResponseCache()
+        assert not cache.is_unchanged(1, FakeResponse(self.BODY % 100))
+        assert not cache.is_unchanged(1, FakeResponse(self.BODY % 100))
+        cache.commit()
+        assert cache.is_unchanged(1, FakeResponse(self.BODY % 200))
+        assert cache.bytes_saved == len(self.BODY % 200)
+        assert 'api_bytes_saved_total' in METRICS.render()
+
+    def test_discarded_body_is_processed_again(self):
+        cache = ResponseCache()
+        cache.is_unchanged(1, FakeResponse(self.BODY % 100))
+        cache.discard()
+        assert not cache.is_unchanged(1, FakeResponse(self.BODY % 100))
+
+    def test_conditional_request(self, monkeypatch):
+        cache = ResponseCache()
+        sent_headers = []
+        responses = [
+            FakeResponse(self.BODY % 100, headers={'ETag': '"v1"'}),
+            FakeResponse(b'', status_code=304),
+        ]
+
+        def mock_get(**kwargs):
+            sent_headers.append(kwargs['headers'])
+            return responses.pop(0)
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        headers = {'Authorization': 'OAuth token'}
+        assert homework.request_homeworks(headers, 1, cache=cache) == {
+            'homeworks': [], 'current_date': 100
+        }
+        cache.commit()
+        assert homework.request_homeworks(headers, 1, cache=cache) is None
+        assert 'If-None-Match' not in sent_headers[0]
+        assert sent_headers[1]['If-None-Match'] == '"v1"'
+        assert sent_headers[1]['Accept-Encoding'] == 'gzip'
+
+    def test_steady_state_poll_gets_not_modified(self, monkeypatch):
+        requests_sent = []
+        clock = [1000]
+
+        def mock_get(**kwargs):
+            from_date = kwargs['params']['from_date']
+            etag = kwargs['headers'].get('If-None-Match')
+            requests_sent.append((from_date, etag))
+            clock[0] += 10
+            homeworks = [] if from_date >= 1000 else [
+                {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+            ]
+            current = f'"{len(homeworks)}"'
+            if etag == current:
+                return FakeResponse(b'', status_code=304)
+            return FakeResponse(
+                json.dumps(
+                    {'homeworks': homeworks, 'current_date': clock[0]}
+                ).encode(),
+                headers={'ETag': current},
+            )
+
+        monkeypatch.setattr(requests, 'get', mock_get)
+        state = homework.TenantState(100)
+
+        def fetch(timestamp):
+            return homework.request_homeworks(
+                {'Authorization': 'OAuth token'}, timestamp, cache=state.cache
+            )
+
+        for _ in range(4):
+            homework.poll_once(state, fetch, lambda message: True)
+        assert requests_sent == [
+            (100, None), (1010, '"1"'), (1020, '"0"'), (1020, '"0"')
+        ]
@@ -0,0 +1,56 @@
+import homework
+from cursor import CursorStore
+
+
+class TestCursorStore:
+
+    def test_cursor_survives_restart(self, tmp_path):
+        path = tmp_path / 'cursor.json'
+        CursorStore(path).set('default', 1000)
+        assert CursorStore(path).get('default') == 1000
+        assert [item.name for item in tmp_path.iterdir()] == ['cursor.json']
+
+    def test_flush_interval_batches_writes(self, tmp_path):
+        path = tmp_path / 'cursor.json'
+        cursors = CursorStore(path, flush_interval=3600)
+        cursors.set('tenant', 1000)
+        assert not path.exists()
+        cursors.flush()
+        assert CursorStore(path).get('tenant') == 1000
+
+    def test_shared_file_keeps_other_replicas_cursors(self, tmp_path):
+        path = tmp_path / 'cursor.json'
+        first = CursorStore(path, shared=True)
+        second = CursorStore(path, shared=True)
+        first.set('a', 200)
+        second.set('b', 300)
+        first.set('a', 250)
+        cursors = CursorStore(path)
+        assert (cursors.get('a'), cursors.get('b')) == (250, 300)
+
+    def test_poll_once_advances_cursor(self, tmp_path):
+        cursors = CursorStore(tmp_path / 'cursor.json')
+        state = homework.TenantState(100, cursors)
+        requested = []
+
+        def fetch(timestamp):
+            requested.append(timestamp)
+            return {
+                'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+                'current_date': 200,
+            }
+
+        homework.poll_once(state, fetch, lambda message: True)
+        homework.poll_once(state, fetch, lambda message: True)
+        assert requested == [100, 200]
+        assert homework.TenantState(0, CursorStore(cursors.path)).timestamp == 200
+
+    def test_cursor_kept_when_message_not_sent(self, tmp_path):
+        state = homework.TenantState(100)
+        response = {
+            'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+            'current_date': 200,
+        }
+        homework.poll_once(state, lambda timestamp: response, lambda m: None)
+        assert state.timestamp == 100
+        assert state.last_message == ''
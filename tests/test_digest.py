@@ -0,0 +1,91 @@
+import time
+
+import homework
+from digest import MessageBuffer, message_length, split_message
+from sender import ERROR_PRIORITY, SendQueue
+from storage import MemoryStatusStore
+from utils import RecordingBot
+
+
+class TestSplitMessage:
+
+    def test_parts_are_combined_up_to_limit(self):
+        parts = [f'{number:03d}' + 'x' * 96 for number in range(100)]
+        messages = split_message(parts, limit=1000)
+        assert all(len(message) <= 1000 for message in messages)
+        assert len(messages) == 12
+        assert '\n\n'.join(messages).split('\n\n') == parts
+
+    def test_long_part_is_cut(self):
+        messages = split_message(['short', 'y' * 25], limit=10)
+        assert messages == ['short', 'y' * 10, 'y' * 10, 'y' * 5]
+
+    def test_length_is_counted_in_utf16(self):
+        assert message_length('ok😀') == 4
+        messages = split_message(['😀' * 5], limit=4)
+        assert messages == ['😀' * 2, '😀' * 2, '😀']
+
+
+class TestDigest:
+
+    def test_burst_is_sent_as_one_message(self):
+        bot = RecordingBot()
+        queue = SendQueue(bot, rate=1000, chat_rate=1000, digest_window=0.2)
+        for number in range(50):
+            queue.put(1, f'status {number}')
+        queue.put(2, 'other chat')
+        queue.put(1, 'error', priority=ERROR_PRIORITY)
+        time.sleep(0.1)
+        assert [text for _, text, _ in bot.sent] == ['error']
+        time.sleep(0.3)
+        texts = sorted(text for _, text, _ in bot.sent)
+        assert len(texts) == 3
+        assert texts[2].split('\n\n') == [
+            f'status {number}' for number in range(50)
+        ]
+        queue.close(timeout=5)
+
+    def test_close_flushes_digests(self):
+        bot = RecordingBot()
+        queue = SendQueue(bot, rate=1000, chat_rate=1000, digest_window=3600)
+        queue.put(1, 'a')
+        queue.put(1, 'b')
+        started = time.monotonic()
+        queue.close(timeout=5)
+        assert time.monotonic() - started < 1
+        assert [text for _, text, _ in bot.sent] == ['a\n\nb']
+
+    def test_message_buffer(self):
+        sent = []
+        buffer = MessageBuffer()
+        assert buffer.add('a') and buffer.add('b')
+        assert buffer.flush(lambda text: sent.append(text) or True)
+        assert sent == ['a\n\nb']
+        assert buffer.flush(sent.append)
+        assert sent == ['a\n\nb']
+
+    def test_poll_once_remembers_only_sent_digest(self):
+        state = homework.TenantState(100, store=MemoryStatusStore())
+        response = {
+            'homeworks': [
+                {'id': 1, 'homework_name': 'first', 'status': 'approved'},
+                {'id': 2, 'homework_name': 'second', 'status': 'rejected'},
+            ],
+            'current_date': 200,
+        }
+        sent = []
+        homework.poll_once(
+            state, lambda timestamp: response,
+            lambda text: sent.append(text) and False, digest=True
+        )
+        assert len(sent) == 1
+        assert state.timestamp == 100
+        assert len(state.changed(response['homeworks'])) == 2
+        homework.poll_once(
+            state, lambda timestamp: response,
+            lambda text: sent.append(text) or True, digest=True
+        )
+        assert len(sent) == 2 and '"first"' in sent[1]
+        assert '"second"' in sent[1]
+        assert state.timestamp == 200
+        assert state.changed(response['homeworks']) == []
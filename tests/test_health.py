@@ -0,0 +1,80 @@
+import json
+import threading
+
+import homework
+from health import Heartbeat, Watchdog, format_stacks
+from utils import FakeClock
+
+
+class TestHeartbeat:
+
+    def test_stage_and_age(self):
+        clock = FakeClock()
+        heartbeat = Heartbeat(clock)
+        with heartbeat.stage('poll'):
+            clock.now = 5
+            assert heartbeat.stalled(3)[0][1:] == ('poll', 5)
+            assert not heartbeat.stalled(10)
+        heartbeat.beat('poll')
+        clock.now = 7
+        assert not heartbeat.stalled(1)
+        assert heartbeat.status(1) == {
+            'ok': True, 'age': {'poll': 2}, 'stalled': []
+        }
+
+    def test_poll_once_beats(self, monkeypatch):
+        heartbeat = Heartbeat()
+        monkeypatch.setattr(homework, 'HEARTBEAT', heartbeat)
+        state = homework.TenantState(0)
+        homework.poll_once(
+            state, lambda timestamp: {'homeworks': [], 'current_date': 1},
+            lambda message: True
+        )
+        assert 'poll' in heartbeat.last
+        assert not heartbeat.running
+
+
+class TestWatchdog:
+
+    def test_reports_stall_once_and_writes_file(self, tmp_path, caplog):
+        clock = FakeClock()
+        heartbeat = Heartbeat(clock)
+        path = tmp_path / 'health.json'
+        watchdog = Watchdog(heartbeat, timeout=10, exit_on_stall=False,
+                            health_file=str(path))
+        with heartbeat.stage('poll'):
+            clock.now = 11
+            assert watchdog.check()
+            assert watchdog.check()
+            status = json.loads(path.read_text(encoding='utf-8'))
+        assert not status['ok']
+        assert status['stalled'] == [{'stage': 'poll', 'seconds': 11}]
+        stalls = [
+            record for record in caplog.records
+            if 'дольше' in record.getMessage()
+        ]
+        assert len(stalls) == 1
+        assert 'test_reports_stall_once' in stalls[0].getMessage()
+        assert not watchdog.check()
+        assert json.loads(path.read_text(encoding='utf-8'))['ok']
+
+    def test_exit_on_stall(self, monkeypatch):
+        clock = FakeClock()
+        heartbeat = Heartbeat(clock)
+        exits = []
+        monkeypatch.setattr('os._exit', exits.append)
+        watchdog = Watchdog(heartbeat, timeout=1, exit_on_stall=True)
+        with heartbeat.stage('send'):
+            clock.now = 2
+            watchdog.check()
+        assert exits == [70]
+
+    def test_format_stacks_names_threads(self):
+        event = threading.Event()
+        thread = threading.Thread(target=event.wait, name='stuck-worker')
+        thread.start()
+        try:
+            assert 'stuck-worker' in format_stacks()
+        finally:
+            event.set()
+            thread.join()
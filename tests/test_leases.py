@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import homework
+from leases import LeaseKeeper, LeaseTable
+from storage import StatusStore
+from utils import FakeClock
+from webhook import WebhookReceiver, serve_webhook
+
+
+def replica(path, log_path, ttl):
+    keeper = LeaseKeeper(LeaseTable(path, ttl=ttl), ['default']).start()
+    state = homework.TenantState(0, store=StatusStore(path), leases=keeper)
+
+    def fetch(timestamp):
+        tick = int(time.time() * 10)
+        return {
+            'homeworks': [{
+                'homework_name': f'hw{tick}',
+                'status': 'approved',
+                'date_updated': str(tick),
+            }],
+            'current_date': 0,
+        }
+
+    def send(message):
+        with open(log_path, 'a', encoding='utf-8') as file:
+            file.write(f'{os.getpid()} {message}\n')
+        return True
+
+    while True:
+        homework.poll_once(state, fetch, send)
+        time.sleep(0.05)
+
+
+def read_log(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as file:
+        return [line.rstrip('\n').split(' ', 1) for line in file]
+
+
+def wait_for(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestLeaseTable:
+
+    def test_lease_moves_only_after_expiry(self, tmp_path):
+        clock = FakeClock(1000.0)
+        path = tmp_path / 'homework.db'
+        first = LeaseTable(path, 'first', ttl=6, clock=clock)
+        second = LeaseTable(path, 'second', ttl=6, clock=clock)
+        assert first.acquire(['a', 'b']) == {'a', 'b'}
+        assert second.acquire(['a', 'c']) == {'c'}
+        clock.now += 5
+        assert first.acquire(['a']) == {'a'}
+        clock.now += 5
+        assert second.acquire(['a', 'c']) == {'c'}
+        clock.now += 2
+        assert second.acquire(['a', 'b', 'c']) == {'a', 'b', 'c'}
+        assert first.acquire(['a', 'b']) == set()
+        second.release()
+        assert first.acquire(['a', 'b']) == {'a', 'b'}
+
+    def test_keeper_stops_sending_before_lease_expires(self, tmp_path):
+        clock = FakeClock(1000.0)
+        table = LeaseTable(tmp_path / 'homework.db', ttl=6, clock=clock)
+        keeper = LeaseKeeper(table, ['a'], clock=clock)
+        keeper.renew()
+        sent = []
+        send = keeper.fence('a', sent.append)
+        assert keeper.holds('a') and not keeper.holds('b')
+        send('first')
+        clock.now += 4
+        assert not keeper.holds('a')
+        assert not send('second')
+        assert sent == ['first']
+
+    def test_poll_skipped_without_lease(self, tmp_path):
+        clock = FakeClock(1000.0)
+        path = tmp_path / 'homework.db'
+        LeaseTable(path, 'other', clock=clock).acquire(['default'])
+        keeper = LeaseKeeper(LeaseTable(path, clock=clock), ['default'])
+        keeper.renew()
+        polls = []
+        homework.poll_once(
+            homework.TenantState(0, leases=keeper),
+            lambda timestamp: polls.append(timestamp), lambda text: True
+        )
+        assert not polls
+
+    def test_webhook_push_fenced_without_lease(self, tmp_path):
+        clock = FakeClock(1000.0)
+        path = tmp_path / 'homework.db'
+        LeaseTable(path, 'other', clock=clock).acquire(['default'])
+        keeper = LeaseKeeper(LeaseTable(path, clock=clock), ['default'])
+        keeper.renew()
+        state = homework.TenantState(0, leases=keeper)
+        sent = []
+        receiver = WebhookReceiver(homework.handle_response)
+        receiver.subscribe(
+            state.key, state,
+            state.fence(lambda text: sent.append(text) or True)
+        )
+        payload = {'homeworks': [
+            {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+        ]}
+        assert not receiver.receive(None, payload)
+        assert sent == []
+
+    def test_busy_webhook_port_falls_back_to_polling(self):
+        receiver = WebhookReceiver(homework.handle_response)
+        server = serve_webhook(receiver, port=0)
+        try:
+            assert serve_webhook(
+                receiver, port=server.server_address[1]
+            ) is None
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestReplicas:
+
+    def test_standby_takes_over_without_duplicates(self, tmp_path):
+        path = str(tmp_path / 'homework.db')
+        log_path = str(tmp_path / 'sent.log')
+        context = multiprocessing.get_context('fork')
+        replicas = [
+            context.Process(target=replica, args=(path, log_path, 1.5))
+            for _ in range(2)
+        ]
+        for process in replicas:
+            process.start()
+        try:
+            assert wait_for(lambda: len(read_log(log_path)) >= 5, 10)
+            leader = int(read_log(log_path)[0][0])
+            assert {int(pid) for pid, _ in read_log(log_path)} == {leader}
+            os.kill(leader, signal.SIGKILL)
+            killed_at = time.monotonic()
+            assert wait_for(
+                lambda: any(
+                    int(pid) != leader for pid, _ in read_log(log_path)
+                ), 10
+            )
+            assert time.monotonic() - killed_at < 4
+        finally:
+            for process in replicas:
+                process.kill()
+                process.join()
+        messages = [message for _, message in read_log(log_path)]
+        assert len(messages) == len(set(messages))
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+
+import homework
+import tenants
+from cassette import VirtualClock
+from cursor import CursorStore
+from lifecycle import Lifecycle
+from sender import SendQueue
+from utils import RecordingBot
+
+STATUSES = ('reviewing', 'approved')
+
+
+class TestLifecycle:
+
+    def test_signal_interrupts_sleep(self):
+        lifecycle = Lifecycle()
+        handlers = {
+            signum: signal.getsignal(signum)
+            for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)
+        }
+        lifecycle.install()
+        try:
+            threading.Timer(
+                0.1, os.kill, (os.getpid(), signal.SIGHUP)
+            ).start()
+            started = time.monotonic()
+            with lifecycle.interruptible():
+                time.sleep(5)
+            assert time.monotonic() - started < 2
+            assert lifecycle.take_reload()
+            assert not lifecycle.take_reload()
+            assert not lifecycle.stopping
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def test_run_polling_waits_on_injected_clock(self, monkeypatch):
+        clock = VirtualClock()
+        delays = []
+        monkeypatch.setattr(
+            homework, 'get_api_answer',
+            lambda timestamp: {'homeworks': [], 'current_date': timestamp}
+        )
+
+        def sleep(delay):
+            delays.append(delay)
+            clock.sleep(delay)
+            if len(delays) == 3:
+                monkeypatch.setattr(homework.LIFECYCLE, 'stopping', True)
+
+        homework.run_polling(RecordingBot(), clock=clock, sleep=sleep)
+        assert delays == [homework.RETRY_PERIOD] * 3
+        assert clock() == 3 * homework.RETRY_PERIOD
+
+    def test_reload_verdicts(self, tmp_path, monkeypatch):
+        path = tmp_path / 'verdicts.json'
+        path.write_text('{"approved": "Принято!"}', encoding='utf-8')
+        monkeypatch.setenv('VERDICTS_FILE', str(path))
+        monkeypatch.setattr(
+            homework, 'HOMEWORK_VERDICTS', dict(homework.HOMEWORK_VERDICTS)
+        )
+        homework.reload_settings()
+        assert homework.HOMEWORK_VERDICTS['approved'] == 'Принято!'
+        path.write_text('[]', encoding='utf-8')
+        homework.reload_settings()
+        assert homework.HOMEWORK_VERDICTS['approved'] == 'Принято!'
+
+
+class TestTenantRunner:
+
+    def test_reload_and_graceful_stop(self, tmp_path, monkeypatch):
+        polls = {}
+
+        def mock_request(headers, timestamp, **kwargs):
+            token = headers['Authorization'].split()[-1]
+            poll = polls[token] = polls.get(token, -1) + 1
+            return {
+                'homeworks': [{
+                    'homework_name': token,
+                    'status': STATUSES[poll % 2],
+                    'date_updated': str(poll),
+                }],
+                'current_date': timestamp + 1,
+            }
+
+        monkeypatch.setattr(homework, 'request_homeworks', mock_request)
+        monkeypatch.setattr(homework, 'RETRY_PERIOD', 0.05)
+        config = [tenants.Tenant('a', 1, 'a'), tenants.Tenant('b', 2, 'b')]
+        lifecycle = Lifecycle()
+        bot = RecordingBot()
+        cursors = CursorStore(tmp_path / 'cursor.json', flush_interval=3600)
+
+        def control():
+            time.sleep(0.3)
+            config[:] = [
+                tenants.Tenant('a', 10, 'a'), tenants.Tenant('c', 3, 'c')
+            ]
+            lifecycle.request_reload()
+            time.sleep(0.3)
+            lifecycle.stop()
+
+        threading.Thread(target=control).start()
+        started = time.monotonic()
+        asyncio.run(tenants.run_tenants(
+            list(config), bot, workers=2, cursors=cursors,
+            queue=SendQueue(bot, rate=1000, chat_rate=1000),
+            lifecycle=lifecycle, load=lambda: list(config)
+        ))
+        assert time.monotonic() - started < 2
+        chats = [chat_id for chat_id, _, _ in bot.sent]
+        assert {1, 2, 3, 10} <= set(chats)
+        assert chats.index(10) > chats.index(1)
+        assert 1 not in chats[chats.index(10):]
+        saved = CursorStore(cursors.path)
+        assert saved.get('a') and saved.get('c')
@@ -0,0 +1,107 @@
+import gzip
+import json
+import logging
+import logging.handlers
+import queue
+
+import homework
+import logs
+
+
+def make_record(level, **extra):
+    record = logging.LogRecord(
+        'test', level, __file__, 1, 'message', (), None
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+class Counted:
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return 'counted'
+
+
+class TestLogs:
+
+    def test_parse_sampling(self):
+        assert logs.parse_sampling('DEBUG=0.1, info=0.5') == {
+            logging.DEBUG: 0.1, logging.INFO: 0.5
+        }
+        assert logs.parse_sampling('') == {}
+        assert logs.parse_sampling('DEBUG=0.5,message_sent=0') == {
+            logging.DEBUG: 0.5, 'message_sent': 0
+        }
+
+    def test_sampling_filter(self):
+        sampling = logs.SamplingFilter({logging.DEBUG: 0})
+        assert not sampling.filter(make_record(logging.DEBUG))
+        assert sampling.filter(make_record(logging.ERROR))
+
+    def test_event_sampling_overrides_level(self):
+        sampling = logs.SamplingFilter({logging.DEBUG: 1, 'message_sent': 0})
+        assert not sampling.filter(
+            make_record(logging.DEBUG, event='message_sent')
+        )
+        assert sampling.filter(
+            make_record(logging.DEBUG, event='status_changed')
+        )
+
+    def test_json_formatter(self):
+        record = make_record(
+            logging.INFO, event='status_changed', tenant='a',
+            homework_id=1, status='approved', latency=None
+        )
+        entry = json.loads(logs.JsonFormatter().format(record))
+        assert entry['level'] == 'INFO'
+        assert entry['message'] == 'message'
+        assert entry['tenant'] == 'a' and entry['homework_id'] == 1
+        assert 'latency' not in entry
+        assert entry['time'].endswith('+00:00')
+
+    def test_disabled_level_is_not_formatted(self, caplog):
+        argument = Counted()
+        with caplog.at_level(logging.INFO, logger='homework'):
+            homework.logger.debug('value %s', argument)
+        assert argument.calls == 0
+
+    def test_poll_failure_fields(self, caplog):
+        def fail(timestamp):
+            raise ConnectionError('down')
+
+        with caplog.at_level(logging.ERROR):
+            homework.poll_once(
+                homework.TenantState(0, key='a'), fail, lambda text: True
+            )
+        record = next(
+            record for record in caplog.records
+            if getattr(record, 'event', None) == 'poll_failed'
+        )
+        assert record.tenant == 'a'
+        assert record.stage == 'get_api_answer'
+        assert record.error == 'ConnectionError'
+
+    def test_full_queue_drops_records(self):
+        handler = logs.DroppingQueueHandler(queue.Queue(1))
+        handler.handle(make_record(logging.INFO))
+        handler.handle(make_record(logging.INFO))
+        assert handler.dropped == 1
+
+    def test_rotated_logs_are_compressed(self, tmp_path):
+        path = tmp_path / 'program.log'
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=100, backupCount=2
+        )
+        handler.namer = logs.gzip_namer
+        handler.rotator = logs.gzip_rotator
+        for _ in range(30):
+            handler.emit(make_record(logging.INFO))
+        handler.close()
+        archive = tmp_path / 'program.log.1.gz'
+        with gzip.open(archive, 'rt') as file:
+            assert 'message' in file.read()
+        assert not (tmp_path / 'program.log.1').exists()
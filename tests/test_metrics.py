@@ -0,0 +1,73 @@
+import inspect
+import json
+import urllib.request
+
+import pytest
+
+import homework
+from metrics import Metrics, serve_metrics
+
+
+class TestMetrics:
+
+    def test_timed_counts_latency_and_errors(self):
+        metrics = Metrics()
+
+        @metrics.timed('stage')
+        def stage(value):
+            """Этап."""
+            if value is None:
+                raise ValueError('value')
+            return value
+
+        assert stage(1) == 1
+        with pytest.raises(ValueError):
+            stage(None)
+        assert len(inspect.signature(stage).parameters) == 1
+        assert stage.__doc__ == 'Этап.'
+        assert metrics.histogram('stage_seconds', stage='stage').count == 2
+        assert metrics.counter(
+            'stage_errors_total', stage='stage', error='ValueError'
+        ) == 1
+
+    def test_render_prometheus_format(self):
+        metrics = Metrics()
+        metrics.inc('errors_total', stage='get_api_answer', error='http_500')
+        metrics.observe('stage_seconds', 0.02, stage='parse_status')
+        text = metrics.render()
+        assert (
+            'homework_errors_total{error="http_500",stage="get_api_answer"} 1'
+        ) in text
+        assert (
+            'homework_stage_seconds_bucket{stage="parse_status",le="0.025"} 1'
+        ) in text
+        assert 'homework_stage_seconds_count{stage="parse_status"} 1' in text
+        assert 'count=1' in metrics.dump()
+
+    def test_http_endpoint(self):
+        server = serve_metrics(0)
+        host, port = server.server_address
+        try:
+            with urllib.request.urlopen(
+                f'http://{host}:{port}/metrics'
+            ) as response:
+                body = response.read().decode()
+            with urllib.request.urlopen(
+                f'http://{host}:{port}/health'
+            ) as response:
+                health = json.loads(response.read())
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert body.endswith('\n')
+        assert health['ok']
+
+    def test_pipeline_is_instrumented(self):
+        before = homework.METRICS.histogram(
+            'stage_seconds', stage='parse_status'
+        )
+        count = before.count if before else 0
+        homework.parse_status({'homework_name': 'hw', 'status': 'approved'})
+        assert homework.METRICS.histogram(
+            'stage_seconds', stage='parse_status'
+        ).count == count + 1
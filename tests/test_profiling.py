@@ -0,0 +1,114 @@
+import cProfile
+import os
+import signal
+import threading
+
+import pytest
+
+import homework
+from profiling import MemoryTracer, Profiler
+
+
+def poll(profiler):
+    with profiler.iteration():
+        homework.check_response({'homeworks': []})
+        homework.parse_status(
+            {'homework_name': 'hw', 'status': 'approved'}
+        )
+
+
+class TestProfiler:
+
+    def test_profiles_requested_iterations(self, tmp_path):
+        path = tmp_path / 'profile.txt'
+        profiler = Profiler(str(path), iterations=3)
+        poll(profiler)
+        assert not path.exists()
+        profiler.request()
+        for _ in range(2):
+            poll(profiler)
+        assert not path.exists()
+        poll(profiler)
+        report = path.read_text(encoding='utf-8')
+        assert 'Профиль 3 итераций' in report
+        assert 'parse_status' in report and 'check_response' in report
+        assert (tmp_path / 'profile.txt.prof').exists()
+        assert not profiler.remaining
+
+    def test_profiles_concurrent_polls(self, tmp_path):
+        path = tmp_path / 'profile.txt'
+        profiler = Profiler(str(path), iterations=8)
+        profiler.request()
+        barrier = threading.Barrier(4)
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(2):
+                    with profiler.iteration():
+                        barrier.wait(timeout=5)
+                        homework.check_response({'homeworks': []})
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert not profiler.remaining
+        assert profiler.profile is None
+        assert 'Профиль 8 итераций' in path.read_text(encoding='utf-8')
+
+    @pytest.mark.parametrize('shared', [True, False])
+    def test_busy_profiler_skips_iteration(self, monkeypatch, tmp_path,
+                                           shared):
+        class BusyProfile(cProfile.Profile):
+
+            def enable(self):
+                raise ValueError('Another profiling tool is already active')
+
+        monkeypatch.setattr(cProfile, 'Profile', BusyProfile)
+        profiler = Profiler(str(tmp_path / 'profile.txt'), shared=shared)
+        profiler.request(2)
+        poll(profiler)
+        assert profiler.remaining == 2
+
+    def test_signal_requests_profile(self, monkeypatch, tmp_path):
+        profiler = Profiler(str(tmp_path / 'profile.txt'), iterations=1)
+        handler = signal.signal(signal.SIGUSR1, profiler._on_signal)
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+        finally:
+            signal.signal(signal.SIGUSR1, handler)
+        assert profiler.remaining == 1
+        monkeypatch.setattr(homework, 'PROFILER', profiler)
+        homework.poll_once(
+            homework.TenantState(0),
+            lambda timestamp: {'homeworks': [], 'current_date': 1},
+            lambda message: True
+        )
+        assert 'poll_once' in (tmp_path / 'profile.txt').read_text(
+            encoding='utf-8'
+        )
+
+
+class TestMemoryTracer:
+
+    def test_writes_growth_between_snapshots(self, tmp_path):
+        path = tmp_path / 'memory.txt'
+        tracer = MemoryTracer(str(path), top=5)
+        tracer.enabled = True
+        try:
+            tracer.check()
+            assert not path.exists()
+            leak = [bytearray(1000) for _ in range(1000)]
+            tracer.check()
+        finally:
+            tracer.enabled = False
+            tracer.check()
+        report = path.read_text(encoding='utf-8')
+        assert 'test_profiling.py' in report
+        assert 'MiB' in report
+        assert leak
@@ -0,0 +1,50 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from scheduler import AdaptiveScheduler, FixedScheduler, create_scheduler
+
+
+def make_state(failures=0, pending=(), idle=0):
+    return SimpleNamespace(
+        failures=failures,
+        pending=set(pending),
+        changed_at=time.monotonic() - idle,
+    )
+
+
+class TestSchedulers:
+
+    def test_fixed_scheduler(self):
+        assert FixedScheduler(600).next_delay(make_state(failures=3)) == 600
+
+    def test_create_scheduler(self):
+        assert isinstance(create_scheduler(600), FixedScheduler)
+        assert isinstance(create_scheduler(600, 'adaptive'), AdaptiveScheduler)
+        with pytest.raises(ValueError):
+            create_scheduler(600, 'unknown')
+
+    def test_reviewing_polls_faster(self):
+        scheduler = AdaptiveScheduler(600, reviewing_period=120)
+        assert scheduler.next_delay(make_state(pending={'1'})) == 120
+        assert scheduler.next_delay(make_state()) == 600
+
+    def test_idle_backoff(self):
+        scheduler = AdaptiveScheduler(600, idle_after=100, idle_max=1500)
+        assert scheduler.next_delay(make_state(idle=150)) == 1200
+        assert scheduler.next_delay(make_state(idle=10 ** 6)) == 1500
+
+    def test_failure_backoff_with_jitter(self):
+        scheduler = AdaptiveScheduler(600, failure_max=3600)
+        assert scheduler.next_delay(make_state(failures=1)) == 600
+        delays = {
+            scheduler.next_delay(make_state(failures=3)) for _ in range(20)
+        }
+        assert all(600 <= delay <= 2400 for delay in delays)
+        assert len(delays) > 1
+        assert scheduler.next_delay(make_state(failures=1000)) <= 3600
+
+    def test_floor(self):
+        scheduler = AdaptiveScheduler(600, floor=60, reviewing_period=1)
+        assert scheduler.next_delay(make_state(pending={'1'})) == 60
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+
+import telegram
+
+from sender import ERROR_PRIORITY, SendQueue, TokenBucket, create_bot
+from utils import RecordingBot
+
+
+class TestTokenBucket:
+
+    def test_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+        now = time.monotonic()
+        assert bucket.delay(now) == 0
+        bucket.consume()
+        assert 0.4 < bucket.delay(now) <= 0.5
+        assert bucket.delay(now + 0.5) == 0
+
+
+class TestSendQueue:
+
+    def test_status_messages_go_before_errors(self):
+        bot = RecordingBot()
+        bot.gate.clear()
+        queue = SendQueue(bot, rate=1000, chat_rate=1000)
+        queue.put(1, 'first')
+        time.sleep(0.05)
+        queue.put(1, 'error', priority=ERROR_PRIORITY)
+        queue.put(1, 'status')
+        bot.gate.set()
+        queue.close(timeout=5)
+        assert [text for _, text, _ in bot.sent] == [
+            'first', 'status', 'error'
+        ]
+
+    def test_retry_after_is_honored(self):
+        bot = RecordingBot(errors=[telegram.error.RetryAfter(0.2)])
+        queue = SendQueue(bot, rate=1000, chat_rate=1000)
+        started = time.monotonic()
+        queue.put(1, 'message')
+        queue.close(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['message']
+        assert bot.sent[0][2] - started >= 0.2
+
+    def test_network_error_keeps_chat_order(self):
+        bot = RecordingBot(errors=[telegram.error.NetworkError('reset')])
+        queue = SendQueue(bot, rate=1000, chat_rate=1000, workers=2)
+        queue.put(1, 'first')
+        time.sleep(0.05)
+        queue.put(1, 'second')
+        queue.put(2, 'other')
+        queue.close(timeout=5)
+        assert [text for _, text, _ in bot.sent] == [
+            'other', 'first', 'second'
+        ]
+
+    def test_busy_chat_does_not_block_others(self):
+        bot = RecordingBot()
+        queue = SendQueue(bot, rate=1000, chat_rate=5)
+        for number in range(3):
+            queue.put(1, f'chat1-{number}')
+        queue.put(2, 'chat2')
+        queue.close(timeout=5)
+        texts = [text for _, text, _ in bot.sent]
+        assert texts.index('chat2') < texts.index('chat1-1')
+        chat1_times = [sent_at for chat, _, sent_at in bot.sent if chat == 1]
+        assert chat1_times[2] - chat1_times[0] >= 0.35
+
+    def test_bad_request_is_dropped(self):
+        bot = RecordingBot(errors=[telegram.error.BadRequest('chat')])
+        queue = SendQueue(bot, rate=1000, chat_rate=1000)
+        queue.put(1, 'lost')
+        queue.put(2, 'sent')
+        queue.close(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['sent']
+        assert not queue.put(3, 'closed')
+
+
+class SlowBot(RecordingBot):
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.active = set()
+        self.overlaps = 0
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text):
+        with self.lock:
+            if chat_id in self.active:
+                self.overlaps += 1
+            self.active.add(chat_id)
+        time.sleep(self.latency)
+        with self.lock:
+            self.active.discard(chat_id)
+        super().send_message(chat_id, text)
+
+
+class TestConcurrentSending:
+
+    def test_workers_send_to_chats_concurrently(self):
+        bot = SlowBot(0.1)
+        queue = SendQueue(bot, rate=1000, chat_rate=1000, workers=4)
+        started = time.monotonic()
+        for chat_id in range(8):
+            queue.put(chat_id, 'message')
+        queue.close(timeout=5)
+        assert len(bot.sent) == 8
+        assert time.monotonic() - started < 0.6
+
+    def test_chat_order_is_kept(self):
+        bot = SlowBot(0.002)
+        queue = SendQueue(bot, rate=10000, chat_rate=10000, workers=4)
+        for number in range(30):
+            for chat_id in range(3):
+                queue.put(chat_id, number)
+        queue.close(timeout=10)
+        assert not bot.overlaps
+        for chat_id in range(3):
+            assert [
+                text for chat, text, _ in bot.sent if chat == chat_id
+            ] == list(range(30))
+
+    def test_create_bot_uses_connection_pool(self):
+        bot = create_bot('1234:abcdefg', pool_size=5)
+        assert bot.request.con_pool_size == 5
+
+
+class TestOutbox:
+
+    def test_unsent_messages_survive_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.json')
+        bot = RecordingBot()
+        bot.gate.clear()
+        queue = SendQueue(bot, rate=1000, chat_rate=1000, workers=1)
+        for number in range(3):
+            queue.put(1, f'status {number}')
+        queue.put(2, 'error', priority=ERROR_PRIORITY)
+        queue.close(timeout=0.1)
+        assert queue.save(path) == 4
+        bot.gate.set()
+
+        bot = RecordingBot()
+        queue = SendQueue(bot, rate=1000, chat_rate=1000)
+        assert queue.load(path) == 4
+        queue.close(timeout=5)
+        assert [text for chat_id, text, _ in bot.sent if chat_id == 1] == [
+            'status 0', 'status 1', 'status 2'
+        ]
+        assert queue.save(path) == 0
+        assert not os.path.exists(path)
+
+    def test_unsent_digest_is_saved_by_parts(self, tmp_path):
+        path = str(tmp_path / 'outbox.json')
+        queue = SendQueue(RecordingBot(), digest_window=60)
+        queue.put(1, 'a')
+        queue.put(1, 'b')
+        assert queue.save(path) == 2
+        bot = RecordingBot()
+        restored = SendQueue(bot, digest_window=0.01)
+        assert restored.load(path) == 2
+        restored.close(timeout=5)
+        assert [text for _, text, _ in bot.sent] == ['a\n\nb']
+
+    def test_foreign_outbox_is_not_removed(self, tmp_path):
+        path = tmp_path / 'outbox.json'
+        path.write_text('[[1, "other replica", 0]]')
+        queue = SendQueue(RecordingBot())
+        queue.close(timeout=1)
+        assert queue.save(str(path)) == 0
+        assert path.exists()
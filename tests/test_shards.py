@@ -0,0 +1,68 @@
+import multiprocessing
+import os
+
+import shards
+from cursor import CursorStore
+from tenants import Tenant
+
+
+def crash_once(path, index, workers, iterations):
+    marker = f'{path}.{index}'
+    if index == 1 and not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(3)
+    with open(f'{path}.done', 'a') as file:
+        file.write(f'{index}\n')
+
+
+class TestShards:
+
+    def test_ring_balance_and_stability(self):
+        keys = [f'tenant-{number}' for number in range(10000)]
+        before = shards.HashRing(range(4))
+        after = shards.HashRing(range(5))
+        sizes = [0] * 4
+        moved = 0
+        for key in keys:
+            node = before.node_for(key)
+            sizes[node] += 1
+            if after.node_for(key) != node:
+                moved += 1
+                assert after.node_for(key) == 4
+        assert min(sizes) > len(keys) / 4 * 0.7
+        assert 0.1 < moved / len(keys) < 0.3
+
+    def test_shard_port(self):
+        assert [shards.shard_port(9100, index) for index in range(3)] == [
+            9101, 9102, 9103
+        ]
+        assert shards.shard_port(0, 2) == 0
+
+    def test_shard_tenants(self):
+        tenants = [Tenant('token', number) for number in range(100)]
+        parts = shards.shard_tenants(tenants, 3)
+        assert sorted(
+            tenant.chat_id for part in parts for tenant in part
+        ) == list(range(100))
+        assert parts == shards.shard_tenants(tenants, 3)
+
+    def test_cursors_follow_moved_tenants(self, tmp_path, monkeypatch):
+        cursor_file = str(tmp_path / 'cursor.json')
+        monkeypatch.setattr(shards.homework, 'CURSOR_FILE', cursor_file)
+        CursorStore(cursor_file).set('a', 100)
+        CursorStore(shards.shard_path(cursor_file, 0)).set('a', 300)
+        CursorStore(shards.shard_path(cursor_file, 1)).set('a', 200)
+        cursors = shards.open_cursors(1, ['a', 'b'])
+        assert cursors.get('a') == 300
+        assert cursors.get('b') is None
+
+    def test_supervisor_restarts_crashed_shard(self, tmp_path):
+        path = str(tmp_path / 'tenants.json')
+        supervisor = shards.Supervisor(
+            path, 3, target=crash_once, restart_max=0.1,
+            context=multiprocessing.get_context('fork'),
+        )
+        supervisor.run()
+        with open(f'{path}.done') as file:
+            assert sorted(file.read().split()) == ['0', '1', '2']
+        assert supervisor.restarts == [0, 1, 0]
@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import homework
+import requests
+import telegram
+from utils import FakeResponse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPROVED = json.dumps({
+    'homeworks': [{'homework_name': 'hw', 'status': 'approved'}],
+    'current_date': 200,
+}).encode()
+
+
+class TestStartup:
+
+    def test_import_defers_heavy_modules(self):
+        code = (
+            'import sys, homework; '
+            'print(sorted({"telegram", "requests", "dotenv", "http.server"}'
+            ' & set(sys.modules)))'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT_DIR,
+            capture_output=True, text=True, check=True
+        )
+        assert result.stdout.strip() == '[]'
+
+    def test_run_once_returns_after_one_poll(self, monkeypatch):
+        sent = []
+        monkeypatch.setattr(homework, 'RUN_ONCE', True)
+        monkeypatch.setattr(requests, 'get', lambda **kwargs: FakeResponse(APPROVED))
+        monkeypatch.setattr(
+            telegram.Bot, 'send_message',
+            lambda self, chat_id, text: sent.append(text)
+        )
+
+        def fail_sleep(seconds):
+            raise AssertionError('sleep в режиме --once')
+
+        monkeypatch.setattr(time, 'sleep', fail_sleep)
+        homework.main()
+        assert len(sent) == 1
@@ -0,0 +1,120 @@
+import homework
+from storage import MemoryStatusStore, StatusStore, diff_homeworks
+
+
+class TestStatusStore:
+    HOMEWORK = {
+        'id': 123,
+        'homework_name': 'hw123',
+        'status': 'approved',
+        'date_updated': '2020-02-13T14:40:57Z',
+    }
+
+    def test_status_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'homework.db')
+        store = StatusStore(path)
+        assert store.changed('tenant', [self.HOMEWORK]) == [self.HOMEWORK]
+        store.remember('tenant', self.HOMEWORK)
+        store.close()
+
+        store = StatusStore(path)
+        assert store.get('tenant', 123) == (
+            'approved', '2020-02-13T14:40:57Z'
+        )
+        assert store.changed('tenant', [self.HOMEWORK]) == []
+        assert store.changed('other', [self.HOMEWORK]) == [self.HOMEWORK]
+        rejected = dict(self.HOMEWORK, status='rejected')
+        assert store.changed('tenant', [rejected]) == [rejected]
+
+    def test_restart_does_not_resend_status(self, tmp_path):
+        path = str(tmp_path / 'homework.db')
+        response = {'homeworks': [self.HOMEWORK], 'current_date': 200}
+        sent = []
+
+        def send(message):
+            sent.append(message)
+            return True
+
+        for _ in range(2):
+            state = homework.TenantState(100, store=StatusStore(path))
+            homework.poll_once(state, lambda timestamp: response, send)
+            state.store.close()
+        assert len(sent) == 1
+
+    def test_lookup_in_chunks(self, tmp_path):
+        store = StatusStore(str(tmp_path / 'homework.db'))
+        homeworks = [
+            dict(self.HOMEWORK, id=number) for number in range(1200)
+        ]
+        for homework_item in homeworks[::2]:
+            store.remember('tenant', homework_item)
+        changed = store.changed('tenant', homeworks)
+        assert [item['id'] for item in changed] == list(range(1, 1200, 2))
+
+
+class TestDiffHomeworks:
+
+    def test_changed_homeworks_in_update_order(self):
+        homeworks = [
+            {'id': 3, 'status': 'approved', 'date_updated': '2020-03-01'},
+            {'id': 2, 'status': 'reviewing', 'date_updated': '2020-02-01'},
+            {'id': 1, 'status': 'approved', 'date_updated': '2020-01-01'},
+        ]
+        known = {'2': ('reviewing', '2020-02-01')}
+        assert [hw['id'] for hw in diff_homeworks(homeworks, known)] == [1, 3]
+
+    def test_latest_duplicate_wins(self):
+        homeworks = [
+            {'id': 1, 'status': 'approved', 'date_updated': '2020-02-01'},
+            {'id': 1, 'status': 'reviewing', 'date_updated': '2020-01-01'},
+        ]
+        assert diff_homeworks(homeworks, {}) == homeworks[:1]
+
+    def test_poll_once_sends_every_changed_homework(self):
+        state = homework.TenantState(100, store=MemoryStatusStore())
+        response = {
+            'homeworks': [
+                {'id': 2, 'homework_name': 'second', 'status': 'approved',
+                 'date_updated': '2020-02-01'},
+                {'id': 1, 'homework_name': 'first', 'status': 'rejected',
+                 'date_updated': '2020-01-01'},
+            ],
+            'current_date': 200,
+        }
+        sent = []
+
+        def send(message):
+            sent.append(message)
+            return True
+
+        homework.poll_once(state, lambda timestamp: response, send)
+        homework.poll_once(state, lambda timestamp: response, send)
+        assert len(sent) == 2
+        assert '"first"' in sent[0] and '"second"' in sent[1]
+
+    def test_unknown_status_does_not_block_others(self):
+        state = homework.TenantState(100, store=MemoryStatusStore())
+        response = {
+            'homeworks': [
+                {'id': 2, 'homework_name': 'second', 'status': 'approved',
+                 'date_updated': '2020-02-01'},
+                {'id': 1, 'homework_name': 'first', 'status': 'weird',
+                 'date_updated': '2020-01-01'},
+            ],
+            'current_date': 200,
+        }
+        sent = []
+        errors = []
+
+        def send(message):
+            sent.append(message)
+            return True
+
+        for _ in range(3):
+            homework.poll_once(
+                state, lambda timestamp: response, send,
+                lambda message: errors.append(message) or True
+            )
+        assert len(sent) == 1 and '"second"' in sent[0]
+        assert len(errors) == 1 and 'Ключ отсутствует' in errors[0]
+        assert state.timestamp == 200
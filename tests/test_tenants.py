@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+
+import exceptions
+import homework
+import leases
+import tenants
+import utils
+
+
+class TestTenants:
+
+    def test_load_tenants(self, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'practicum_token': 'token1', 'chat_id': 1},
+            {'practicum_token': 'token2', 'chat_id': 2, 'name': 'second'},
+        ]))
+        loaded = tenants.load_tenants(path)
+        assert [tenant.name for tenant in loaded] == ['1', 'second']
+        assert loaded[0].headers == {'Authorization': 'OAuth token1'}
+
+    @pytest.mark.parametrize('data', [
+        {}, [{'chat_id': 1}], ['token'],
+        [{'practicum_token': 'token1', 'chat_id': 1},
+         {'practicum_token': 'token2', 'chat_id': 1}],
+        [{'practicum_token': 'token1', 'chat_id': 1},
+         {'practicum_token': 'token2', 'chat_id': 2, 'name': '1'}],
+    ])
+    def test_load_invalid_tenants(self, tmp_path, data):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps(data))
+        with pytest.raises(exceptions.TenantConfigError):
+            tenants.load_tenants(path)
+
+    def test_run_tenants_keeps_separate_state(self, monkeypatch):
+        def mock_request(headers, timestamp, **kwargs):
+            token = headers['Authorization'].split()[-1]
+            return {
+                'homeworks': [{'homework_name': token, 'status': 'approved'}],
+                'current_date': timestamp,
+            }
+
+        monkeypatch.setattr(homework, 'request_homeworks', mock_request)
+        bot = utils.MockTelegramBot()
+        sent = []
+        monkeypatch.setattr(
+            bot, 'send_message',
+            lambda chat_id, text: sent.append((chat_id, text))
+        )
+        all_tenants = [
+            tenants.Tenant(f'token{number}', number) for number in range(50)
+        ]
+        states = asyncio.run(
+            tenants.run_tenants(all_tenants, bot, workers=4, iterations=1)
+        )
+        assert len(sent) == 50
+        assert {chat_id for chat_id, _ in sent} == set(range(50))
+        assert states[7].last_message.startswith(
+            'Изменился статус проверки работы "token7"'
+        )
+
+    def test_outbox_is_sent_after_restart(self, monkeypatch, tmp_path):
+        outbox = tmp_path / 'outbox.json'
+        outbox.write_text(json.dumps([[7, 'saved', 0]]))
+        monkeypatch.setattr(
+            homework, 'request_homeworks',
+            lambda headers, timestamp, **kwargs: {
+                'homeworks': [], 'current_date': timestamp
+            }
+        )
+        bot = utils.MockTelegramBot()
+        sent = []
+        monkeypatch.setattr(
+            bot, 'send_message',
+            lambda chat_id, text: sent.append((chat_id, text))
+        )
+        asyncio.run(tenants.run_tenants(
+            [tenants.Tenant('token', 1)], bot, iterations=1,
+            outbox=str(outbox)
+        ))
+        assert sent == [(7, 'saved')]
+        assert not outbox.exists()
+
+    def test_replica_restores_only_its_outbox(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(tenants, 'REPLICA_LEASES', True)
+        monkeypatch.setattr(leases, 'REPLICA_ID', 'r1')
+        monkeypatch.setattr(homework, 'STORE_FILE', str(tmp_path / 'db'))
+        monkeypatch.setattr(
+            homework, 'request_homeworks',
+            lambda headers, timestamp, **kwargs: {
+                'homeworks': [], 'current_date': timestamp
+            }
+        )
+        other = leases.LeaseTable(homework.STORE_FILE, 'r2', ttl=60)
+        other.acquire(['2'])
+        shared = tmp_path / 'outbox.json'
+        shared.write_text(json.dumps([[1, 'shared', 0]]))
+        own = tmp_path / 'outbox.r1.json'
+        own.write_text(json.dumps([[1, 'mine', 0], [2, 'not mine', 0]]))
+        bot = utils.MockTelegramBot()
+        sent = []
+        monkeypatch.setattr(
+            bot, 'send_message',
+            lambda chat_id, text: sent.append((chat_id, text))
+        )
+        asyncio.run(tenants.run_tenants(
+            [tenants.Tenant('token1', 1), tenants.Tenant('token2', 2)], bot,
+            iterations=1, outbox=str(shared)
+        ))
+        other.close()
+        assert sent == [(1, 'mine')]
+        assert not own.exists()
+        assert shared.exists()
@@ -0,0 +1,71 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import homework
+from webhook import WebhookReceiver, serve_webhook
+
+PAYLOAD = {
+    'homeworks': [{
+        'id': 1,
+        'homework_name': 'hw123',
+        'status': 'approved',
+        'date_updated': '2020-02-13T14:40:57Z',
+    }],
+    'current_date': 200,
+}
+
+
+@pytest.fixture
+def webhook():
+    sent = []
+
+    def send(message):
+        sent.append(message)
+        return True
+
+    state = homework.TenantState(100)
+    receiver = WebhookReceiver(homework.handle_response, secret='secret')
+    receiver.subscribe('student', state, send)
+    server = serve_webhook(receiver, port=0)
+    host, port = server.server_address
+    yield f'http://{host}:{port}/webhook', state, sent
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, payload, **headers):
+    headers.setdefault('X-Webhook-Secret', 'secret')
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers=headers
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+class TestWebhook:
+
+    def test_pushed_status_is_sent_once(self, webhook):
+        url, state, sent = webhook
+        assert post(url, PAYLOAD) == 200
+        assert post(url, PAYLOAD, **{'X-Tenant': 'student'}) == 200
+        homework.poll_once(state, lambda timestamp: PAYLOAD, sent.append)
+        assert len(sent) == 1
+        assert sent[0].endswith(homework.HOMEWORK_VERDICTS['approved'])
+
+    def test_push_does_not_move_cursor(self, webhook):
+        url, state, _ = webhook
+        post(url, PAYLOAD)
+        assert state.timestamp == 100
+
+    def test_invalid_requests(self, webhook):
+        url, _, sent = webhook
+        assert post(url, {'current_date': 1}) == 400
+        assert post(url, PAYLOAD, **{'X-Webhook-Secret': 'wrong'}) == 403
+        assert post(url, PAYLOAD, **{'X-Tenant': 'unknown'}) == 404
+        assert sent == []
@@ -1,4 +1,7 @@
+import json
 import logging
+import threading
+import time
 from collections import namedtuple
 from contextlib import contextmanager
 from http import HTTPStatus
@@ -103,3 +106,38 @@ class MockTelegramBot:
 
 class BreakInfiniteLoop(Exception):
     pass
+
+
+class FakeClock:
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+
+    def __init__(self, content=b'{}', status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class RecordingBot:
+
+    def __init__(self, errors=()):
+        self.sent = []
+        self.errors = list(errors)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def send_message(self, chat_id, text):
+        self.gate.wait()
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text, time.monotonic()))
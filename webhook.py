@@ -0,0 +1,141 @@
+"""Приём статусов домашних работ, присланных на локальный HTTP-адрес."""
+import hmac
+import json
+import logging
+import os
+import threading
+from http import HTTPStatus
+
+from metrics import METRICS
+
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 0))
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '127.0.0.1')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_RECONCILE_PERIOD = int(os.getenv('WEBHOOK_RECONCILE_PERIOD', 3600))
+WEBHOOK_MAX_BODY = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookReceiver:
+    """Передаёт присланные ответы в обработку подписанным пользователям.
+
+    Присланное тело имеет тот же формат, что и ответ API, и проходит
+    через `handle` — ту же проверку, разбор и дедупликацию, что и ответ
+    на опрос. Курсор `from_date` при этом не сдвигается: опрос остаётся
+    сверкой на случай потерянных уведомлений.
+    """
+
+    def __init__(self, handle, secret=WEBHOOK_SECRET):
+        """Приёмник, передающий ответы в `handle`."""
+        self.handle = handle
+        self.secret = secret
+        self.subscribers = {}
+
+    def subscribe(self, key, state, send):
+        """Регистрирует пользователя под ключом `key`."""
+        self.subscribers[str(key)] = (state, send)
+
+    def is_authorized(self, secret):
+        """Проверяет секрет из заголовка запроса."""
+        if not self.secret:
+            return True
+        return hmac.compare_digest(secret or '', self.secret)
+
+    def resolve(self, key):
+        """Подписчик по ключу; без ключа — единственный подписчик."""
+        if key is None and len(self.subscribers) == 1:
+            return next(iter(self.subscribers.values()))
+        return self.subscribers.get(str(key))
+
+    def receive(self, key, payload):
+        """Обрабатывает присланный ответ пользователя `key`."""
+        state, send = self.resolve(key)
+        with METRICS.timer('webhook'):
+            return self.handle(state, payload, send)
+
+
+class WebhookHandler:
+    """Принимает POST-запросы с ответами API.
+
+    Примешивается к `BaseHTTPRequestHandler` при запуске сервера, чтобы
+    импорт модуля не тянул за собой `http.server`.
+    """
+
+    receiver = None
+
+    def do_POST(self):
+        """Приём присланного ответа API."""
+        if self.path.split('?')[0] != WEBHOOK_PATH:
+            self._reply(HTTPStatus.NOT_FOUND, 'not found')
+            return
+        if not self.receiver.is_authorized(
+                self.headers.get('X-Webhook-Secret')):
+            self._reply(HTTPStatus.FORBIDDEN, 'forbidden')
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > WEBHOOK_MAX_BODY:
+            self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'too large')
+            return
+        key = self.headers.get('X-Tenant')
+        if self.receiver.resolve(key) is None:
+            self._reply(HTTPStatus.NOT_FOUND, f'unknown tenant {key}')
+            return
+        try:
+            payload = json.loads(self.rfile.read(length))
+            delivered = self.receiver.receive(key, payload)
+        except Exception as error:
+            logger.error(f'Некорректные данные webhook: {error}')
+            METRICS.inc(
+                'errors_total', stage='webhook', error=type(error).__name__
+            )
+            self._reply(HTTPStatus.BAD_REQUEST, str(error))
+            return
+        if not delivered:
+            self._reply(HTTPStatus.SERVICE_UNAVAILABLE, 'not delivered')
+            return
+        self._reply(HTTPStatus.OK, 'ok')
+
+    def _reply(self, status, text):
+        body = json.dumps({'status': text}, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Запросы логируются только на уровне DEBUG."""
+        logger.debug(format % args)
+
+
+def serve_webhook(receiver, port=WEBHOOK_PORT, host=WEBHOOK_HOST):
+    """Запускает приём webhook в фоновом потоке.
+
+    Если порт занят, например другой копией бота при `REPLICA_LEASES`,
+    возвращает None: бот тогда работает обычным опросом.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    handler = type(
+        'WebhookRequestHandler',
+        (WebhookHandler, BaseHTTPRequestHandler),
+        {'receiver': receiver},
+    )
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as error:
+        logger.error(
+            f'Приём webhook на {host}:{port} не запущен: {error}; '
+            f'статусы будут получены опросом'
+        )
+        return None
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='webhook-http', daemon=True
+    ).start()
+    logger.info(
+        f'Приём webhook на http://{host}:{server.server_address[1]}'
+        f'{WEBHOOK_PATH}'
+    )
+    return server